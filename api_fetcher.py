@@ -0,0 +1,170 @@
+"""
+This file holds the ApiFetcher class, which downloads wiki pages through the MediaWiki API instead
+of as full HTML pages.
+
+Author: Raine Fuerst
+"""
+
+import urllib.parse
+import requests
+from fetcher import PageFetcher
+from rate_control import CircuitOpenError
+
+
+DEFAULT_API_URL = "https://bg3.wiki/w/api.php"
+# The article body returned by the API is a bare fragment, without the charset declaration of the
+# full page. html5lib guesses windows-1252 for undeclared bytes, which garbles characters like ●
+CHARSET = b'<meta charset="utf-8">'
+
+
+class ApiError(Exception):
+    """
+    Raised when the MediaWiki API returns an error instead of the requested page.
+    """
+
+
+class ApiFetcher(PageFetcher):
+    """
+    This class handles downloading pages through the MediaWiki API. Only the article body is
+    downloaded, without the skin, navigation and scripts of the full page. The revision ids of
+    every page are looked up in batches beforehand, so a page is only downloaded if its cached copy
+    or previous result is out of date.
+    """
+
+    # The most titles the API accepts in a single query
+    BATCH_SIZE = 50
+
+    def __init__(
+            self, workers=1, timeout=5, cache=None, profiler=None, rate=None, retries=3,
+            api_url=DEFAULT_API_URL, snapshot=None, record=None, transport=None
+        ):
+        super().__init__(
+            workers, timeout, cache, profiler, rate, retries, snapshot, record, transport
+        )
+        self.api_url = api_url
+        self.revisions = {}
+
+    @staticmethod
+    def _declare_charset(content):
+        """
+        Returns the given article body starting with CHARSET, for bodies cached without it.
+        """
+        return content if content.startswith(CHARSET) else CHARSET + content
+
+    @staticmethod
+    def _title(url):
+        """
+        Returns the title of the wiki page at the given url, or None if it is not an article url.
+        Empty url cells are read as NaN, which are not article urls either.
+        """
+        if not isinstance(url, str):
+            return None
+        path = urllib.parse.urlparse(url).path
+        if not path.startswith("/wiki/"):
+            return None
+        return urllib.parse.unquote(path[len("/wiki/"):]).replace("_", " ")
+
+    def prepare(self, urls):
+        """
+        Looks up the current revision id of every given page, BATCH_SIZE titles at a time.
+
+        Args:
+            urls (iterable): The urls of the pages that are going to be downloaded
+        """
+        if self.snapshot is not None or (self.cache is not None and self.cache.offline):
+            return
+        titles = list(dict.fromkeys(x for x in map(self._title, urls) if x))
+        for start in range(0, len(titles), self.BATCH_SIZE):
+            batch = titles[start:start + self.BATCH_SIZE]
+            try:
+                r = self.request(self.api_url, params={
+                    "action": "query",
+                    "prop": "revisions",
+                    "rvprop": "ids",
+                    "titles": "|".join(batch),
+                    "redirects": 1,
+                    "format": "json",
+                    "formatversion": 2,
+                })
+                query = r.json()["query"]
+            except (requests.exceptions.RequestException, CircuitOpenError, ValueError, KeyError):
+                # Pages without a revision id are still downloaded, just never skipped
+                continue
+            resolved = {x: x for x in batch}
+            for rename in query.get("normalized", []) + query.get("redirects", []):
+                for title, target in resolved.items():
+                    if target == rename["from"]:
+                        resolved[title] = rename["to"]
+            revisions = {
+                page["title"]: page["revisions"][0]["revid"]
+                for page in query.get("pages", []) if page.get("revisions")
+            }
+            for title, target in resolved.items():
+                if target in revisions:
+                    self.revisions[title] = revisions[target]
+
+    def revision_id(self, url):
+        """
+        Returns the revision id of the given page found by prepare().
+
+        Args:
+            url (str): The url of the page
+
+        Returns:
+            int: The revision id, or None if it is not known
+        """
+        return self.revisions.get(self._title(url))
+
+    def get(self, url):
+        """
+        Downloads the article body of the given url through the API. Urls that are not articles are
+        downloaded as normal.
+
+        Args:
+            url (str): The url of the page to download
+
+        Returns:
+            bytes: The HTML of the article body, starting with its charset declaration
+
+        Raises:
+            CacheMissError: If the cache is offline and does not contain the page
+            ApiError: If the API returns an error, such as the page not existing
+        """
+        requests.Request("GET", url).prepare()
+        title = self._title(url)
+        if title is None:
+            return super().get(url)
+        if self.cache is not None:
+            revision = self.revision_id(url)
+            etag = self.cache.conditional_headers(url).get("If-None-Match")
+            if self.cache.offline or (revision is not None and etag == f'"{revision}"'):
+                return self._declare_charset(self.cache.read(url))
+        r = self.request(self.api_url, params={
+            "action": "parse",
+            "page": title,
+            "prop": "text|revid",
+            "redirects": 1,
+            "disablelimitreport": 1,
+            "disableeditsection": 1,
+            "format": "json",
+            "formatversion": 2,
+        })
+        try:
+            response = r.json()
+        except ValueError as error:
+            raise ApiError(f"Invalid response ({r.status_code})") from error
+        if "error" in response:
+            raise ApiError(response["error"].get("code"))
+        content = CHARSET + response["parse"]["text"].encode("utf-8")
+        if self.cache is not None:
+            self.cache.store(url, content, {"ETag": f'"{response["parse"]["revid"]}"'})
+        return content
+
+    def _download(self, url):
+        """
+        Downloads the given url for fetch, turning the errors that can occur into error messages.
+        """
+        try:
+            return super()._download(url)
+        except ApiError as error:
+            return (None, f"API Error: {error}: {url}")
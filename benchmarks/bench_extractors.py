@@ -0,0 +1,160 @@
+"""
+This file benchmarks the extractors in parse_items and the listing parsers of ItemCollector against
+the pages in benchmarks/fixtures, for every available BeautifulSoup parser backend. It runs fully
+offline and reports the operations per second and peak memory of each operation.
+
+The fixtures are synthetic: they follow the markup of bg3.wiki pages, but their items (Amulet_0,
+Sword_0, Dyes...) and their text are made up. The numbers compare backends and versions of the
+extractors, they are not the timings of pages of the real wiki.
+
+Usage: python benchmarks/bench_extractors.py [--backends html5lib html.parser lxml] [--json FILE]
+
+Author: Raine Fuerst
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+from description import normalize_descriptions
+from item_collector import ItemCollector
+from item_page import ItemPage
+from parse_items import get_description, get_properties, is_duplicate_variation
+from parsers import ItemParser
+import pandas
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# The fixture of each item page and its number of variations, the last one is extracted
+ITEM_FIXTURES = {
+    "item_single.html": 1,
+    "item_dd.html": 1,
+    "item_multi_variation.html": 4,
+}
+BACKENDS = ["html5lib", "html.parser", "lxml"]
+
+
+def load_fixture(name):
+    """
+    Returns the content of the given fixture.
+    """
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def measure(func, repeat=3):
+    """
+    Measures the given function.
+
+    Args:
+        func (callable): The function to measure, called with no arguments
+        repeat (int): The number of timing runs, the fastest is reported
+
+    Returns:
+        dict: The operations per second and the peak memory allocated by a single call in KiB
+    """
+    timer = timeit.Timer(func)
+    (number, _) = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    tracemalloc.start()
+    func()
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ops_per_sec": number / best, "peak_kib": peak / 1024}
+
+
+def item_benchmarks(backend):
+    """
+    Returns the benchmarks of the item page extractors for the given backend.
+    """
+    strainer = ItemParser().strainer()
+    for name, var_num in ITEM_FIXTURES.items():
+        content = load_fixture(name)
+        page = ItemPage(content, backend)
+        yield (name, "ItemPage", lambda c=content: ItemPage(c, backend))
+        # html5lib always builds the whole tree and ignores the strainer
+        if backend != "html5lib":
+            yield (
+                name, "ItemPage (regions only)", lambda c=content: ItemPage(c, backend, strainer)
+            )
+        yield (name, "get_properties", lambda p=page, v=var_num: get_properties(p, v))
+        yield (name, "get_description", lambda p=page, v=var_num: get_description(p, v, False))
+        yield (name, "is_duplicate_variation", lambda p=page: is_duplicate_variation(p))
+
+
+def collector_benchmarks(backend):
+    """
+    Returns the benchmarks of the ItemCollector listing parsers for the given backend.
+    """
+    # pylint: disable=protected-access
+    collector = ItemCollector(None)
+    content = load_fixture("category_list.html")
+    soup = BeautifulSoup(content, backend)
+    yield ("category_list.html", "BeautifulSoup", lambda: BeautifulSoup(content, backend))
+    yield (
+        "category_list.html", "_parse_items_list_soup",
+        lambda: collector._parse_items_list_soup(soup)
+    )
+    special = load_fixture("category_special.html")
+    # The special parser removes the navbox from the soup, so every call needs a fresh parse
+    yield (
+        "category_special.html", "BeautifulSoup + _parse_items_special_soup",
+        lambda: collector._parse_items_special_soup(BeautifulSoup(special, backend))
+    )
+
+
+def description_benchmarks():
+    """
+    Returns the benchmarks of the batch description normalizer, which does not depend on a backend.
+    """
+    page = ItemPage(load_fixture("item_single.html"), "html.parser")
+    raws = pandas.Series([str([str(x) for x in page.blockquotes])] * 1000)
+    yield ("item_single.html x1000", "normalize_descriptions", lambda: normalize_descriptions(raws))
+
+
+def run(backends):
+    """
+    Runs every benchmark for the given backends and prints the results.
+
+    Returns:
+        list: A dict for every benchmark with its backend, fixture, operation and measurements
+    """
+    results = []
+    print(f"{'backend':<12} {'fixture':<28} {'operation':<42} {'ops/sec':>10} {'peak KiB':>10}")
+    for backend in backends:
+        if builder_registry.lookup(backend) is None:
+            print(f"{backend:<12} skipped, the parser is not installed")
+            continue
+        for fixture, operation, func in [*item_benchmarks(backend), *collector_benchmarks(backend)]:
+            results.append({"backend": backend, "fixture": fixture, "operation": operation})
+            results[-1].update(measure(func))
+    for fixture, operation, func in description_benchmarks():
+        results.append({"backend": "-", "fixture": fixture, "operation": operation})
+        results[-1].update(measure(func))
+    for result in results:
+        print(
+            f"{result['backend']:<12} {result['fixture']:<28} {result['operation']:<42} "
+            f"{result['ops_per_sec']:>10.1f} {result['peak_kib']:>10.1f}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--backends", nargs="+", default=BACKENDS, help="The BeautifulSoup parsers to benchmark."
+    )
+    parser.add_argument("--json", help="The file to write the results to as JSON.")
+    args = parser.parse_args()
+    benchmark_results = run(args.backends)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(benchmark_results, json_file, indent=4)
@@ -0,0 +1,157 @@
+"""
+This file benchmarks the peak memory of parse_files as the number of items grows, to check that
+it stays flat when the results are written to a streaming output format. Each run parses a
+generated input file of fixture pages from benchmarks/fixtures in its own process, so that the
+peak resident memory of one run does not carry over to the next. It runs fully offline.
+
+The fixtures are synthetic pages that follow the markup of bg3.wiki pages, their items and text
+are made up and not captured from the real wiki.
+
+Usage: python benchmarks/bench_memory.py [--sizes 500 2000 8000] [--format csv] [--json FILE]
+
+Author: Raine Fuerst
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from fetcher import PageFetcher
+import pandas
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# The fixture of each generated page and its number of variations
+ITEM_FIXTURES = {
+    "item_single.html": 1,
+    "item_dd.html": 1,
+    "item_multi_variation.html": 4,
+}
+SIZES = [500, 2000, 8000]
+MODES = ["default", "low_memory"]
+
+
+class FixtureFetcher(PageFetcher):
+    """
+    This class serves the fixture named by the first part of the url's path instead of downloading
+    the page, so that every generated item can have its own url. It runs several workers like a
+    real run, so that the pages held ahead of parsing count towards the peak.
+    """
+
+    def __init__(self, workers=8):
+        super().__init__(workers)
+        self.fixtures = {}
+        for name in ITEM_FIXTURES:
+            with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+                self.fixtures[name] = f.read()
+
+    def get(self, url):
+        return self.fixtures[url.split("/")[3]]
+
+
+def make_input(path, size):
+    """
+    Writes an input file with the given number of items, cycling through the fixtures.
+
+    Args:
+        path (str): The Excel file to write
+        size (int): The number of rows
+    """
+    rows = []
+    page = 0
+    while len(rows) < size:
+        for name, var_num in ITEM_FIXTURES.items():
+            for variation in range(1, var_num + 1):
+                rows.append({
+                    "item_id": len(rows) + 1,
+                    "category": "Equipment",
+                    "sub_category": "Other",
+                    "name": f"Item {page}",
+                    "variation": variation,
+                    "url": f"http://fixtures/{name}/Item_{page}",
+                })
+            page += 1
+    pandas.DataFrame(rows[:size]).to_excel(path, index=False)
+
+
+def run_child(input_file, mode, file_format, result_file):
+    """
+    Parses the input file in this process and writes the time taken and the peak resident memory
+    to the result file as JSON.
+    """
+    from parse_items import parse_files  # pylint: disable=import-outside-toplevel
+    os.makedirs("output", exist_ok=True)
+    start = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        parse_files(
+            input_file, f"output/output.{file_format}", False, FixtureFetcher(),
+            file_format=file_format, low_memory=mode == "low_memory"
+        )
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mib = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump({"seconds": seconds, "peak_mib": peak_mib}, f)
+
+
+def run(sizes, file_format):
+    """
+    Runs parse_files for every size and mode, each in a new process, and prints the results.
+
+    Returns:
+        list: A dict for every run with its size, mode and measurements
+    """
+    results = []
+    print(f"{'items':>8} {'mode':<12} {'seconds':>9} {'peak MiB':>9} {'KiB/item':>9}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            input_file = os.path.join(work_dir, f"input_{size}.xlsx")
+            make_input(input_file, size)
+            for mode in MODES:
+                result_file = os.path.join(work_dir, "result.json")
+                subprocess.run(
+                    [
+                        sys.executable, os.path.abspath(__file__), "--child", input_file, mode,
+                        file_format, result_file
+                    ],
+                    cwd=work_dir, check=True
+                )
+                with open(result_file, "r", encoding="utf-8") as f:
+                    results.append({"items": size, "mode": mode, **json.load(f)})
+                result = results[-1]
+                print(
+                    f"{size:>8} {mode:<12} {result['seconds']:>9.1f} {result['peak_mib']:>9.1f} "
+                    f"{result['peak_mib'] * 1024 / size:>9.1f}"
+                )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=SIZES, help="The numbers of items to parse."
+    )
+    parser.add_argument(
+        "--format", default="csv", choices=["csv", "parquet", "sqlite", "xlsx"],
+        help="The format of the output file."
+    )
+    parser.add_argument("--json", help="The file to write the results to as JSON.")
+    parser.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(*args.child)
+        sys.exit()
+    benchmark_results = run(args.sizes, args.format)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(benchmark_results, json_file, indent=4)
@@ -0,0 +1,206 @@
+"""
+This file measures how the collect and parse commands of main.py scale with the number of items,
+against a SyntheticWiki served from this process. Every run goes through main.py in its own
+process, so the peak resident memory of one run does not carry over to the next. For each size
+it reports the throughput, the fetch latency percentiles from the run's profile, the requests and
+errors seen by the server and the peak memory, one row per size so that they read as curves.
+
+Usage: python benchmarks/bench_scaling.py [--sizes 100 1000 10000 100000] [--workers 8]
+    [--latency 0.05] [--jitter 0.02] [--error_rate 0.01] [--page_kb 60] [--compress]
+    [--json FILE]
+
+Author: Raine Fuerst
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from synthetic_wiki import SyntheticWiki, item_sub_category, item_variations
+import pandas
+
+
+SIZES = [100, 1000, 10000]
+COMMANDS = ["collect", "parse"]
+
+
+def make_collect_input(path, wiki):
+    """
+    Writes the input file of the collect command, listing every category page of the wiki.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "Input Urls": [{"url": x, "special": False} for x in wiki.category_urls()],
+            "Missing Items": [],
+        }, f)
+
+
+def make_parse_input(path, wiki, size):
+    """
+    Writes the input file of the parse command, with a row for every variation of the wiki's items
+    up to the given number of rows.
+    """
+    rows = []
+    item_id = 0
+    while len(rows) < size:
+        for variation in range(1, item_variations(item_id) + 1):
+            rows.append({
+                "item_id": len(rows) + 1,
+                "category": "Equipment",
+                "sub_category": item_sub_category(item_id),
+                "name": f"Item {item_id}",
+                "variation": variation,
+                "url": f"{wiki.base_url}/wiki/Item_{item_id}",
+            })
+        item_id += 1
+    pandas.DataFrame(rows[:size]).to_excel(path, index=False)
+
+
+def run_child(argv, result_file):
+    """
+    Runs main.py with the given arguments in this process and writes the time taken, the peak
+    resident memory and the profile of the run to the result file as JSON.
+    """
+    import main  # pylint: disable=import-outside-toplevel
+    os.makedirs("output", exist_ok=True)
+    start = time.perf_counter()
+    main.main([*argv, "--profile", "profile.json"])
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mib = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    with open("profile.json", "r", encoding="utf-8") as f:
+        profile = json.load(f)
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump({"seconds": seconds, "peak_mib": peak_mib, "profile": profile}, f)
+
+
+def run_command(work_dir, wiki, argv, size):
+    """
+    Runs main.py with the given arguments in a new process against the wiki, for the given number
+    of items.
+
+    Returns:
+        dict: The measurements of the run
+    """
+    result_file = os.path.join(work_dir, "result.json")
+    (wiki.requests, wiki.errors) = (0, 0)
+    with open(os.path.join(work_dir, "run.log"), "w", encoding="utf-8") as log:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", result_file, "--", *argv],
+            cwd=work_dir, check=True, stdout=log
+        )
+    with open(result_file, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    fetch = result["profile"]["stages"].get("fetch", {})
+    return {
+        "seconds": result["seconds"],
+        # The profile of the collect command counts pages rather than items
+        "items_per_sec": size / result["seconds"],
+        "fetch_p50_ms": fetch.get("p50", 0) * 1000,
+        "fetch_p95_ms": fetch.get("p95", 0) * 1000,
+        "fetch_p99_ms": fetch.get("p99", 0) * 1000,
+        "requests": wiki.requests,
+        "server_errors": wiki.errors,
+        "peak_mib": result["peak_mib"],
+    }
+
+
+def run(sizes, workers, wiki_options):
+    """
+    Runs the collect and parse commands for every size and prints the results.
+
+    Args:
+        sizes (list): The numbers of items to run with
+        workers (int): The number of pages downloaded at once
+        wiki_options (dict): The latency, jitter, error_rate, page_kb and compress options of the
+            SyntheticWiki
+
+    Returns:
+        list: A dict for every run with its command, size and measurements
+    """
+    results = []
+    print(
+        f"{'command':<8} {'items':>7} {'seconds':>8} {'items/s':>8} {'p50 ms':>7} {'p95 ms':>7} "
+        f"{'p99 ms':>7} {'requests':>8} {'errors':>6} {'peak MiB':>8}"
+    )
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            wiki = SyntheticWiki(items=size, **wiki_options)
+            wiki.start()
+            try:
+                make_collect_input(os.path.join(work_dir, "input.json"), wiki)
+                make_parse_input(os.path.join(work_dir, "input.xlsx"), wiki, size)
+                fetch_options = ["--workers", str(workers)]
+                commands = {
+                    "collect": ["collect", "input.json", "output/collected.csv", *fetch_options],
+                    "parse": [
+                        "parse", "input.xlsx", "output/parsed.csv", "--full_parse", *fetch_options
+                    ],
+                }
+                for command in COMMANDS:
+                    results.append({
+                        "command": command,
+                        "items": size,
+                        **run_command(work_dir, wiki, commands[command], size),
+                    })
+                    result = results[-1]
+                    print(
+                        f"{command:<8} {size:>7} {result['seconds']:>8.1f} "
+                        f"{result['items_per_sec']:>8.1f} {result['fetch_p50_ms']:>7.1f} "
+                        f"{result['fetch_p95_ms']:>7.1f} {result['fetch_p99_ms']:>7.1f} "
+                        f"{result['requests']:>8} {result['server_errors']:>6} "
+                        f"{result['peak_mib']:>8.1f}"
+                    )
+            finally:
+                wiki.stop()
+    return results
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        separator = sys.argv.index("--")
+        run_child(sys.argv[separator + 1:], sys.argv[sys.argv.index("--child") + 1])
+        sys.exit()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=SIZES, help="The numbers of items to run with."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="The number of pages to download at once."
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="The seconds the wiki takes per response."
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.02,
+        help="The most seconds added to or taken from the latency."
+    )
+    parser.add_argument(
+        "--error_rate", type=float, default=0.01,
+        help="The fraction of requests the wiki answers with 503."
+    )
+    parser.add_argument("--page_kb", type=int, default=60, help="The size of each item page in KB.")
+    parser.add_argument(
+        "--compress", action="store_true", help="Have the wiki send pages gzip compressed."
+    )
+    parser.add_argument("--json", help="The file to write the results to as JSON.")
+    args = parser.parse_args()
+    benchmark_results = run(args.sizes, args.workers, {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "page_kb": args.page_kb,
+        "compress": args.compress,
+    })
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(benchmark_results, json_file, indent=4)
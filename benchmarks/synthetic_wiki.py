@@ -0,0 +1,389 @@
+"""
+This file holds the SyntheticWiki class, a local HTTP server serving generated pages shaped like
+the bg3.wiki pages read by ItemCollector and parse_files, for load testing without the real wiki.
+Category pages list their items with bg3wiki-itemicon spans, and item pages have a property list
+and a description blockquote for every variation, with the ● separated names of the variations.
+The latency, error rate and size of the pages can be configured, and pages can be sent gzip
+compressed to clients that accept it. The article bodies and revision ids of the pages are also
+served through a stub of the MediaWiki API, for ApiFetcher. Faults can be switched on while it is
+running: throttling with 429 and a Retry-After, a full outage, and latency that grows with the
+number of requests in flight.
+
+Usage: python benchmarks/synthetic_wiki.py [--items 1000] [--latency 0.05] [--error_rate 0.01]
+    [--load_latency 0.01]
+The faults of a running wiki are switched with /faults?down=1&throttled=10&retry_after=2
+
+Author: Raine Fuerst
+"""
+
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+RARITIES = ["Common", "Uncommon", "Rare", "Very Rare", "Legendary", "Story Item"]
+SUB_CATEGORIES = ["Weapons", "Armour", "Rings", "Amulets", "Books", "Consumables"]
+# The number of variations of each item, cycled through by item id
+VARIATIONS = [1, 1, 1, 2, 3]
+# The skin and scripts around the article, repeated to pad pages to the configured size
+PADDING = (
+    '<link rel="stylesheet" href="/load.php?lang=en&amp;modules=skins.vector.styles&amp;'
+    'only=styles&amp;skin=vector">\n'
+)
+# The most titles the API answers in a single query
+API_MAX_TITLES = 50
+HTML = "text/html; charset=utf-8"
+JSON = "application/json; charset=utf-8"
+
+
+def item_variations(item_id):
+    """
+    Returns the number of variations of the given item.
+    """
+    return VARIATIONS[item_id % len(VARIATIONS)]
+
+
+def item_sub_category(item_id):
+    """
+    Returns the sub category of the given item.
+    """
+    return SUB_CATEGORIES[item_id % len(SUB_CATEGORIES)]
+
+
+class SyntheticWiki:
+    """
+    This class serves the synthetic wiki from a background thread. Items are numbered from 0, and
+    category page n lists items n * items_per_category up to the next category.
+
+    Pages:
+        /wiki/Category_<n>: the items of category n
+        /wiki/Item_<id>: the page of the item
+        /w/api.php?action=query&prop=revisions&titles=<titles>: the revision id of each of up to
+            API_MAX_TITLES pages, every query is recorded in queries
+        /w/api.php?action=parse&page=<title>: the article body and revision id of the page
+
+    The revision id of a page is 1 until it is changed in revisions.
+
+    Faults:
+        down: True to answer every request with 503 until it is set back to False
+        throttled: the number of the next requests answered with 429 and a Retry-After of
+            retry_after seconds
+        load_latency: the seconds added to the latency of a response for every other request in
+            flight at the same time
+
+    The faults can also be switched through /faults, which takes them as query parameters.
+    """
+
+    def __init__(
+            self, items=1000, items_per_category=500, latency=0.0, jitter=0.0, error_rate=0.0,
+            page_kb=60, host="127.0.0.1", port=0, seed=0, compress=False, load_latency=0.0
+        ):
+        self.items = items
+        self.items_per_category = items_per_category
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.page_kb = page_kb
+        self.compress = compress
+        self.load_latency = load_latency
+        self.down = False
+        self.throttled = 0
+        self.retry_after = 1
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.revisions = {}
+        self.queries = []
+        wiki = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            This class answers the requests of the synthetic wiki.
+            """
+            protocol_version = "HTTP/1.1"
+            # The headers and body are separate writes, which would otherwise wait on the client's
+            # delayed ACK on a kept-alive connection
+            disable_nagle_algorithm = True
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Answers a GET request after the configured latency.
+                """
+                if self.path.startswith("/faults"):
+                    (status, body, headers) = wiki.set_faults(self.path)
+                else:
+                    (status, body, headers) = wiki.respond(self.path)
+                self.send_response(status)
+                if wiki.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, 6)
+                    self.send_header("Content-Encoding", "gzip")
+                for header, value in headers.items():
+                    self.send_header(header, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                """
+                Does not log every request.
+                """
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        """
+        Returns the url the wiki is served on.
+        """
+        (host, port) = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def category_urls(self):
+        """
+        Returns the url of every category page.
+        """
+        count = -(-self.items // self.items_per_category)
+        return [f"{self.base_url}/wiki/Category_{x}" for x in range(count)]
+
+    def set_faults(self, path):
+        """
+        Switches the faults given as query parameters of the path, and returns the response
+        holding every fault as JSON.
+        """
+        params = urllib.parse.parse_qs(urllib.parse.urlparse(path).query)
+        try:
+            with self.lock:
+                if "down" in params:
+                    self.down = params["down"][-1] not in ("0", "false")
+                if "throttled" in params:
+                    self.throttled = int(params["throttled"][-1])
+                if "retry_after" in params:
+                    self.retry_after = int(params["retry_after"][-1])
+                if "load_latency" in params:
+                    self.load_latency = float(params["load_latency"][-1])
+                faults = {
+                    "down": self.down,
+                    "throttled": self.throttled,
+                    "retry_after": self.retry_after,
+                    "load_latency": self.load_latency,
+                }
+        except ValueError as error:
+            return (400, str(error).encode("utf-8"), {"Content-Type": HTML})
+        return (200, json.dumps(faults).encode("utf-8"), {"Content-Type": JSON})
+
+    def respond(self, path):
+        """
+        Returns the status, body and headers of the response to the given path.
+
+        Args:
+            path (str): The path of the request
+
+        Returns:
+            Tuple(int, bytes, dict): The status code, the body and the headers other than its length
+        """
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            delay = max(0.0, (
+                self.latency + self.load_latency * (self.in_flight - 1)
+                + self.random.uniform(-self.jitter, self.jitter)
+            ))
+            fault = None
+            if self.random.random() < self.error_rate or self.down:
+                fault = (503, b"Service Unavailable", {"Content-Type": HTML})
+            elif self.throttled > 0:
+                self.throttled -= 1
+                fault = (429, b"Too Many Requests", {
+                    "Content-Type": HTML, "Retry-After": str(self.retry_after)
+                })
+            if fault:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        with self.lock:
+            self.in_flight -= 1
+        if fault:
+            return fault
+        request = urllib.parse.urlparse(path)
+        if request.path == "/w/api.php":
+            response = self.api(urllib.parse.parse_qs(request.query))
+            return (200, json.dumps(response).encode("utf-8"), {"Content-Type": JSON})
+        (_, _, page) = request.path.partition("/wiki/")
+        article = self.article(urllib.parse.unquote(page).replace("_", " "))
+        if article is None:
+            return (404, b"Not Found", {"Content-Type": HTML})
+        page = self._page(page.replace("_", " "), article)
+        return (200, page.encode("utf-8"), {"Content-Type": HTML})
+
+    def _item_id(self, title):
+        """
+        Returns the id of the item with the given page title, None if it is not an item.
+        """
+        (kind, _, number) = title.partition(" ")
+        if kind == "Item" and number.isdigit() and int(number) < self.items:
+            return int(number)
+        return None
+
+    def article(self, title):
+        """
+        Returns the article body of the page with the given title, None if there is no such page.
+        """
+        (kind, _, number) = title.partition(" ")
+        if kind == "Category" and number.isdigit():
+            return self.category_article(int(number))
+        item_id = self._item_id(title)
+        return None if item_id is None else self.item_article(item_id)
+
+    def revision(self, title):
+        """
+        Returns the revision id of the page with the given title.
+        """
+        return self.revisions.get(title, 1)
+
+    def api(self, params):
+        """
+        Returns the response of the MediaWiki API to the given query parameters.
+
+        Args:
+            params (dict): The query parameters, each with a list of values
+
+        Returns:
+            dict: The JSON response, in the format of formatversion=2
+        """
+        action = params.get("action", [""])[0]
+        if action == "query":
+            titles = params.get("titles", [""])[0].split("|")
+            with self.lock:
+                self.queries.append(titles)
+            if len(titles) > API_MAX_TITLES:
+                return {"error": {"code": "toomanyvalues", "info": "Too many values for titles"}}
+            pages = []
+            for title in titles:
+                if self.article(title) is None:
+                    pages.append({"ns": 0, "title": title, "missing": True})
+                else:
+                    pages.append({"ns": 0, "title": title, "revisions": [
+                        {"revid": self.revision(title)}
+                    ]})
+            return {"batchcomplete": True, "query": {"pages": pages}}
+        if action == "parse":
+            title = params.get("page", [""])[0]
+            article = self.article(title)
+            if article is None:
+                return {"error": {"code": "missingtitle", "info": "The page doesn't exist"}}
+            return {"parse": {"title": title, "revid": self.revision(title), "text": (
+                f'<div class="mw-parser-output">{article}</div>'
+            )}}
+        return {"error": {"code": "badvalue", "info": f"Unknown action: {action}"}}
+
+    def _page(self, title, article):
+        """
+        Returns a full page holding the given article, padded to the configured size.
+        """
+        repeats = (self.page_kb * 1024 - len(article)) // len(PADDING)
+        padding = PADDING * max(0, repeats)
+        return (
+            '<!DOCTYPE html>\n<html><head><meta charset="UTF-8">'
+            f'<title>{title} - bg3.wiki</title>\n'
+            f'{padding}</head><body><div class="mw-parser-output">{article}</div></body></html>'
+        )
+
+    def category_article(self, category):
+        """
+        Returns the article body listing the items of the given category.
+        """
+        start = category * self.items_per_category
+        rows = []
+        for item_id in range(start, min(start + self.items_per_category, self.items)):
+            link = f'<a href="/wiki/Item_{item_id}" title="Item {item_id}">'
+            rows.append(
+                f'<tr><td><span class="bg3wiki-itemicon"><span typeof="mw:File">{link}'
+                f'<img alt="" src="/w/images/{item_id}.png" width="40" height="40"></a></span>'
+                f'</span> {link}Item {item_id}</a></td><td>{item_id % 500}</td></tr>'
+            )
+        return f'<table>{"".join(rows)}</table>'
+
+    def item_article(self, item_id):
+        """
+        Returns the article body of the given item, with a property list and description for every
+        variation.
+        """
+        variations = item_variations(item_id)
+        article = []
+        for variation in range(variations):
+            rarity = RARITIES[(item_id + variation) % len(RARITIES)]
+            article.append(
+                f'<div class="bg3wiki-property-list"><ul><li>Rarity: <span style="color:#01BFFF">'
+                f'{rarity}</span></li><li>Weight: {0.1 * (item_id % 20 + 1):.1f} kg / '
+                f'{0.2 * (item_id % 20 + 1):.1f} lb</li><li>Price: {10 * (item_id % 300 + 1)} gp'
+                f'</li></ul></div>'
+            )
+        for variation in range(variations):
+            name = f"<b>Item {item_id} {variation + 1}</b> ● " if variations > 1 else ""
+            article.append(
+                f'<div class="bg3wiki-blockquote-text"><p>{name}<i>The description of item '
+                f'{item_id}, variation {variation + 1}.</i>\n</p></div>'
+            )
+        return "".join(article)
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+
+        Returns:
+            str: The url the wiki is served on
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000, help="The number of items.")
+    parser.add_argument(
+        "--items_per_category", type=int, default=500,
+        help="The number of items listed on each category page."
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="The seconds per response.")
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="The most seconds added to or taken from it."
+    )
+    parser.add_argument(
+        "--error_rate", type=float, default=0.0, help="The fraction of requests answered with 503."
+    )
+    parser.add_argument("--page_kb", type=int, default=60, help="The size of each page in KB.")
+    parser.add_argument("--port", type=int, default=8765, help="The port to listen on.")
+    parser.add_argument(
+        "--compress", action="store_true", help="Send pages gzip compressed when accepted."
+    )
+    parser.add_argument(
+        "--load_latency", type=float, default=0.0,
+        help="The seconds added per other request in flight."
+    )
+    args = parser.parse_args()
+    synthetic_wiki = SyntheticWiki(
+        args.items, args.items_per_category, args.latency, args.jitter, args.error_rate,
+        args.page_kb, port=args.port, compress=args.compress, load_latency=args.load_latency
+    )
+    print(f"Serving {args.items} items on {synthetic_wiki.base_url}")
+    try:
+        synthetic_wiki.server.serve_forever()
+    except KeyboardInterrupt:
+        synthetic_wiki.server.server_close()
@@ -0,0 +1,214 @@
+"""
+This file holds the CheckpointJournal class, which records the result of every parsed item as soon
+as it is done so that an interrupted run can be resumed, and the ParseManifest class, which keeps
+the result of every parsed item between runs so that unchanged pages are not parsed again.
+
+Author: Raine Fuerst
+"""
+
+import hashlib
+import json
+import os
+import re
+
+
+REVISION_ID = re.compile(rb'"wgRevisionId":(\d+)')
+
+
+def _to_record(url, variation, result):
+    """
+    Converts the result of a parsed item into a JSON serializable record.
+    """
+    (properties, desc_valid, desc) = result
+    return {
+        "url": url,
+        "variation": float(variation),
+        "rarity": properties["rarity"],
+        "weight": properties["weight"],
+        "price": properties["price"],
+        "errors": properties["errors"],
+        "desc_valid": desc_valid,
+        "desc": desc
+    }
+
+
+def _to_result(record):
+    """
+    Converts a record made by _to_record back into the result of a parsed item.
+    """
+    properties = {
+        "rarity": record["rarity"],
+        "weight": record["weight"],
+        "price": record["price"],
+        "errors": record["errors"]
+    }
+    return (properties, record["desc_valid"], record["desc"])
+
+
+def read_journal(path):
+    """
+    Reads the records of a checkpoint journal, skipping a last line cut off by a crash.
+
+    Args:
+        path (str): The journal to read
+
+    Returns:
+        Tuple(dict, bool): The last record of every item keyed by its url and variation, and True
+            if the last line was cut off
+    """
+    completed = {}
+    cut_off = False
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may have been cut off by the crash being resumed from
+                cut_off = not line.endswith("\n")
+                continue
+            completed[(record["url"], float(record["variation"]))] = record
+    return (completed, cut_off)
+
+
+class CheckpointJournal:
+    """
+    This class handles an append-only JSON lines file holding one parsed item per line, keyed by
+    the item's url and variation.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.completed = {}
+        cut_off = False
+        if resume and os.path.exists(path):
+            (self.completed, cut_off) = read_journal(path)
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+        if cut_off:
+            self.file.write("\n")
+
+    def get(self, url, variation):
+        """
+        Returns the recorded result for the given item.
+
+        Args:
+            url (str): The url of the item's page
+            variation (float): The variation of the item
+
+        Returns:
+            tuple: The properties, description validity and description recorded for the item, or
+                None if the item has not been recorded
+        """
+        record = self.completed.get((url, float(variation)))
+        return _to_result(record) if record else None
+
+    def record(self, url, variation, result):
+        """
+        Appends the result for the given item to the journal and flushes it to disk.
+
+        Args:
+            url (str): The url of the item's page
+            variation (float): The variation of the item
+            result (tuple): The properties, description validity and description of the item
+        """
+        record = _to_record(url, variation, result)
+        self.completed[(url, float(variation))] = record
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        """
+        Closes the journal file.
+        """
+        self.file.close()
+
+
+class ParseManifest:
+    """
+    This class handles a JSON file holding the result of every parsed item along with a fingerprint
+    of the page it was parsed from. Items whose page has the same fingerprint on the next run reuse
+    their previous result instead of being parsed again.
+    """
+
+    # Bump this when the extractors change so that results from older runs are not reused
+    VERSION = 3
+
+    def __init__(self, path, reuse=True):
+        self.path = path
+        self.reuse = reuse
+        self.items = {}
+        self.reused = 0
+        self.recomputed = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["version"] == self.VERSION:
+                for record in manifest["items"]:
+                    self.items[(record["url"], record["variation"])] = record
+
+    @staticmethod
+    def fingerprint(content, empty_desc, revision_id=None):
+        """
+        Returns a fingerprint of the given page. The MediaWiki revision id is used when it is known
+        or the page has one, otherwise a hash of the page is used.
+
+        Args:
+            content (bytes): The content of the page, only used if revision_id is None
+            empty_desc (bool): True if empty descriptions are valid, False otherwise
+            revision_id (int): The revision id of the page, if it is already known
+
+        Returns:
+            str: The fingerprint of the page
+        """
+        if revision_id is None:
+            revision = REVISION_ID.search(content)
+            revision_id = int(revision.group(1)) if revision else None
+        if revision_id is not None:
+            fingerprint = f"rev:{revision_id}"
+        else:
+            fingerprint = f"sha256:{hashlib.sha256(content).hexdigest()}"
+        return f"{fingerprint}:empty_desc" if empty_desc else fingerprint
+
+    def lookup(self, url, variation, fingerprint):
+        """
+        Returns the previous result for the given item if its page has not changed.
+
+        Args:
+            url (str): The url of the item's page
+            variation (float): The variation of the item
+            fingerprint (str): The fingerprint of the page this run
+
+        Returns:
+            tuple: The properties, description validity and description of the item, or None if
+                the item has to be parsed again
+        """
+        record = self.items.get((url, float(variation)))
+        if not self.reuse or record is None or record["fingerprint"] != fingerprint:
+            return None
+        return _to_result(record)
+
+    def update(self, url, variation, fingerprint, result, reused):
+        """
+        Stores the result for the given item and counts whether it was reused or recomputed.
+
+        Args:
+            url (str): The url of the item's page
+            variation (float): The variation of the item
+            fingerprint (str): The fingerprint of the page the result came from
+            result (tuple): The properties, description validity and description of the item
+            reused (bool): True if the result was reused from the previous run
+        """
+        if reused:
+            self.reused += 1
+        else:
+            self.recomputed += 1
+        record = _to_record(url, variation, result)
+        record["fingerprint"] = fingerprint
+        self.items[(url, float(variation))] = record
+
+    def save(self):
+        """
+        Writes the manifest to disk so that it can be used by the next run.
+        """
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "items": list(self.items.values())}, f)
+        os.replace(f"{self.path}.tmp", self.path)
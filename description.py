@@ -0,0 +1,85 @@
+"""
+This file holds the functions that turn the raw description blockquote of an item page into the
+item's description and validate it, either one item at a time or for a whole column of items.
+
+Author: Raine Fuerst
+"""
+
+import re
+import pandas
+
+
+# Everything before the first '>' of the text, and every tag. A '<' without a closing '>' before
+# the next '<' is removed on its own.
+TAGS = re.compile(r"^[^<]*>|<[^<]*>|<")
+QUOTES = str.maketrans("‘’“„", "''\"\"", "\\")
+INVALID_CHARACTER = re.compile(r"[\[\]●]")
+DUPLICATE_QUOTES = re.compile(r"''|\"\"|'\"|\"'")
+
+
+def normalize_description(raw):
+    """
+    Returns a tuple containing the description held in the given raw blockquote text and whether
+    the description is valid.
+
+    Args:
+        raw (str): The string form of the list of blockquote texts for the item
+
+    Returns:
+        Tuple(bool, string): A tuple containing the validity of the description and the item's
+            description.
+            bool: True if the description is valid, false otherwise
+            string: The description if bool is true, the error string otherwise
+    """
+    start = raw.rfind("<p>")
+    description = raw[start + len("<p>"):] if start != -1 else raw
+    end = description.rfind("</p>")
+    if end != -1:
+        description = description[:end]
+    description = TAGS.sub("", description)
+    start = description.find("[")
+    if start != -1:
+        description = description[start + 1:]
+    end = description.rfind("]")
+    if end != -1:
+        description = description[:end]
+    description = description.replace("\\n", "").translate(QUOTES).replace("''", "'")
+    if description.count("'") % 2 != 0:
+        description = description.replace("'", "")
+    if description.count('"') % 2 != 0:
+        description = description.replace('"', "")
+    if (
+        not description or description[0] == "[" or description[-1] == "]" or
+        "●" in description
+    ):
+        invalid = INVALID_CHARACTER.search(description)
+        if invalid:
+            return (
+                False,
+                f"Invalid Description: Invalid Character in Description: {invalid.group()}"
+            )
+    if DUPLICATE_QUOTES.search(description):
+        return (False, f"Invalid Description: Duplicate Quotes: {description}")
+    return (True, description)
+
+
+def normalize_descriptions(raws):
+    """
+    Normalizes and validates a whole column of raw blockquote texts at once. Gives the same results
+    as calling normalize_description on each of them.
+
+    Args:
+        raws (pandas.Series): The string forms of the lists of blockquote texts for each item
+
+    Returns:
+        pandas.DataFrame: A DataFrame with the same index as raws, with a "valid" column holding
+            whether each description is valid and a "description" column holding the description
+            if it is valid, the error string otherwise
+    """
+    # Chained .str methods work on object columns one element at a time anyway and are slower than
+    # a single pass per element, so the column is built from normalize_description directly
+    return pandas.DataFrame(
+        [normalize_description(raw) for raw in raws],
+        columns=["valid", "description"],
+        index=raws.index
+    )
@@ -0,0 +1,238 @@
+"""
+This file holds the PageFetcher class, which handles downloading pages from the wiki for both the
+ItemCollector and parse_files.
+
+Author: Raine Fuerst
+"""
+
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import urllib3
+from page_cache import CacheMissError
+from profiler import NullProfiler
+from rate_control import CircuitOpenError, RateController, parse_retry_after
+from transport import HttpTransport
+
+
+# Responses that mean the wiki is overloaded or throttling us, these are retried
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class PageFetcher:
+    """
+    This class handles downloading pages from the wiki. When given more than one worker, pages are
+    downloaded concurrently with a bounded number of requests in flight. When given a PageCache,
+    cached pages are revalidated instead of downloaded again. The profiler is shared with everything
+    that uses the fetcher, so that a whole run is recorded in one place. Every request goes through
+    a RateController, which lowers the number of requests in flight when the wiki slows down or
+    throttles us and retries failed requests with backoff. Fetched pages can be recorded into a
+    SnapshotWriter, and given a Snapshot the pages are replayed from it without any network access.
+    Requests are sent through an HttpTransport, which keeps a connection open to each host for
+    every worker.
+    """
+
+    def __init__(
+            self, workers=1, timeout=5, cache=None, profiler=None, rate=None, retries=3,
+            snapshot=None, record=None, transport=None
+        ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.transport = (
+            transport if transport else HttpTransport(self.workers, read_timeout=timeout)
+        )
+        self.cache = cache
+        self.profiler = profiler if profiler else NullProfiler()
+        self.rate = rate if rate else RateController(self.workers)
+        self.retries = retries
+        self.snapshot = snapshot
+        self.record = record
+
+    def prepare(self, urls):
+        """
+        Called with every url that is about to be downloaded, so that work can be done for all of
+        them at once. Does nothing for plain page downloads.
+
+        Args:
+            urls (iterable): The urls of the pages that are going to be downloaded
+        """
+
+    def revision_id(self, url):
+        """
+        Returns the revision id of the given page if it is known without downloading the page.
+        Plain page downloads never know it.
+
+        Args:
+            url (str): The url of the page
+
+        Returns:
+            int: The revision id, or None if it is not known
+        """
+        return None
+
+    def request(self, url, params=None, headers=None):
+        """
+        Sends a GET request once the rate controller allows it, retrying timeouts, connection
+        errors and throttled responses.
+
+        Args:
+            url (str): The url to request
+            params (dict): The query parameters of the request
+            headers (dict): The headers of the request
+
+        Returns:
+            requests.Response: The response
+
+        Raises:
+            requests.exceptions.HTTPError: If the response is still throttled after every retry
+            requests.exceptions.Timeout: If the request still times out after every retry
+            requests.exceptions.ConnectionError: If the wiki still cannot be reached after every
+                retry
+            CircuitOpenError: If the circuit breaker is open
+        """
+        requests.Request("GET", url, params=params).prepare()
+        for attempt in range(self.retries + 1):
+            self.rate.acquire()
+            start = time.perf_counter()
+            try:
+                r = self.transport.get(url, params, headers)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                self.rate.release(time.perf_counter() - start, False)
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.rate.backoff(attempt))
+                continue
+            except BaseException:
+                self.rate.release(time.perf_counter() - start, True)
+                raise
+            if r.status_code not in RETRY_STATUSES:
+                self.rate.release(time.perf_counter() - start, True)
+                return r
+            self.rate.release(time.perf_counter() - start, False)
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            if retry_after is not None:
+                self.rate.pause(retry_after)
+            if attempt == self.retries:
+                r.raise_for_status()
+            time.sleep(self.rate.backoff(attempt, retry_after))
+        return None
+
+    def get(self, url):
+        """
+        Downloads the given url.
+
+        Args:
+            url (str): The url of the page to download
+
+        Returns:
+            bytes: The content of the page
+
+        Raises:
+            CacheMissError: If the cache is offline and does not contain the page
+        """
+        if self.cache is None:
+            return self.request(url).content
+        if self.cache.offline:
+            requests.Request("GET", url).prepare()
+            return self.cache.read(url)
+        r = self.request(url, headers=self.cache.conditional_headers(url))
+        if r.status_code == 304:
+            return self.cache.read(url)
+        if r.status_code == 200:
+            self.cache.store(url, r.content, r.headers)
+        return r.content
+
+    def fetch(self, url):
+        """
+        Downloads the given url, catching the errors that can occur while doing so. The result is
+        read from the snapshot instead when replaying one, and added to the recorded snapshot when
+        recording one.
+
+        Args:
+            url (str): The url of the page to download
+
+        Returns:
+            tuple: The content of the page (None on failure) and the error message (None on
+                success)
+        """
+        if self.snapshot is not None:
+            start = time.perf_counter()
+            (content, error) = self.snapshot.fetch(url)
+            self.profiler.record(
+                "fetch", time.perf_counter() - start, url, len(content) if content else 0
+            )
+            return (content, error)
+        (content, error) = self._download(url)
+        if self.record is not None:
+            self.record.add(url, content, error)
+        return (content, error)
+
+    def _download(self, url):
+        """
+        Downloads the given url for fetch, turning the errors that can occur into error messages.
+        """
+        start = time.perf_counter()
+        content = None
+        try:
+            content = self.get(url)
+            return (content, None)
+        except requests.exceptions.MissingSchema:
+            return (None, f"Invalid URL: {url}")
+        except (urllib3.exceptions.ReadTimeoutError, requests.exceptions.Timeout):
+            return (None, f"Timeout Error: {url}")
+        except requests.exceptions.ConnectionError:
+            return (None, f"Connection Error: {url}")
+        except requests.exceptions.HTTPError as error:
+            return (None, f"HTTP Error {error.response.status_code}: {url}")
+        except CircuitOpenError:
+            return (None, f"Too Many Failures: {url}")
+        except CacheMissError:
+            return (None, f"Not Cached: {url}")
+        finally:
+            self.profiler.record(
+                "fetch", time.perf_counter() - start, url, len(content) if content else 0
+            )
+
+    def close(self):
+        """
+        Saves the cache, if there is one, so that it can be used by the next run, finishes the
+        recorded snapshot and closes the connections.
+        """
+        self.profiler.note("connections", self.transport.stats())
+        self.transport.close()
+        if self.cache is not None:
+            self.cache.save()
+        if self.record is not None:
+            self.record.close()
+        if self.snapshot is not None:
+            self.snapshot.close()
+
+    def map(self, func, items, ahead=None):
+        """
+        Calls func on every item and yields the results in the same order as items. At most
+        `workers` calls run at once, and at most `ahead` items are started before the oldest
+        result has been consumed.
+
+        Args:
+            func (callable): The function to call on each item, normally one that calls get()
+            items (iterable): The items to pass to func
+            ahead (int): The most items started and not yet consumed, which bounds the number of
+                results held in memory, defaults to twice the number of workers
+
+        Yields:
+            The result of func for each item, in order
+        """
+        if self.workers == 1:
+            for item in items:
+                yield func(item)
+            return
+        ahead = max(1, ahead) if ahead else self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = collections.deque()
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= ahead:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -8,10 +8,16 @@ TODO: Handle the collection of items
 """
 
 import json
+import urllib.parse
 import requests
 import urllib3
 import pandas as pd
 from bs4 import BeautifulSoup
+from fetcher import PageFetcher
+from writers import open_writer
+
+# The page the links to items are resolved against when the url of the page is not known
+DEFAULT_BASE_URL = "https://bg3.wiki/"
 
 class ItemCollector():
     """
@@ -19,8 +25,11 @@ class ItemCollector():
     the given item.
     """
 
-    def __init__(self, input_file):
+    def __init__(self, input_file, fetcher=None, output_file="test.xlsx", file_format=None):
         self.input_file = input_file
+        self.fetcher = fetcher if fetcher else PageFetcher()
+        self.output_file = output_file
+        self.file_format = file_format
         self.item_df = pd.DataFrame({"name": [], "url": []})
         self.errors = {
             "Item Collection": [],
@@ -34,48 +43,68 @@ class ItemCollector():
         self._parse_input_urls()
         # self._collect_items()
 
+    def iter_items(self):
+        """
+        Parse the list of urls from the input file for items, yielding each item as soon as the page
+        listing it has been parsed. Every item is yielded once, followed by the missing items from
+        the input file.
+
+        Yields:
+            Tuple(str, str): The name and url of each item
+        """
+        with open(self.input_file, "r", encoding="utf-8") as f:
+            url_dict = json.load(f)
+        profiler = self.fetcher.profiler
+        seen_urls = {x["url"] for x in url_dict["Input Urls"]}
+        pages = self.fetcher.map(self.fetcher.fetch, [x["url"] for x in url_dict["Input Urls"]])
+        for url_data, (content, error) in zip(url_dict["Input Urls"], pages):
+            profiler.item_done()
+            if error:
+                self.errors["Item Collection"].append(error)
+                continue
+            # The list is parsed before the special format, which removes the navbox from the soup
+            with profiler.time("parse", url_data["url"]):
+                soup = BeautifulSoup(content, 'html5lib')
+            with profiler.time("extract", url_data["url"]):
+                results = [self._parse_items_list_soup(soup, url_data["url"])]
+                if url_data["special"]:
+                    results.append(self._parse_items_special_soup(soup, url_data["url"]))
+            soup.decompose()
+            for result in results:
+                for name, url in zip(result["name"], result["url"]):
+                    if url not in seen_urls:
+                        seen_urls.add(url)
+                        yield (name, url)
+        for missing_item in url_dict["Missing Items"]:
+            if missing_item["url"] not in seen_urls:
+                seen_urls.add(missing_item["url"])
+                yield (missing_item["name"], missing_item["url"])
+
     def _parse_input_urls(self):
         """
         Parse the list of urls from the input file for items. Adds the items to the dataframe.
         """
-        items = {
+        profiler = self.fetcher.profiler
+        item_columns = {
             "name": [],
             "url": [],
         }
-        with open(self.input_file, "r", encoding="utf-8") as f:
-            url_dict = json.load(f)
-        for url_data in url_dict["Input Urls"]:
-            try:
-                r = requests.get(url_data["url"], timeout=5)
-            except requests.exceptions.MissingSchema:
-                self.errors["Item Collection"].append(f"Invalid URL: {url_data["url"]}")
-            except urllib3.exceptions.ReadTimeoutError:
-                self.errors["Item Collection"].append(f"Timeout Error: {url_data["url"]}")
-            else:
-                result = self._parse_items_list_soup(BeautifulSoup(r.content, 'html5lib'))
-                items["name"].extend(result["name"])
-                items["url"].extend(result["url"])
-                if url_data["special"]:
-                    result = self._parse_items_special_soup(BeautifulSoup(r.content, 'html5lib'))
-                    items["name"].extend(result["name"])
-                    items["url"].extend(result["url"])
-        for missing_item in url_dict["Missing Items"]:
-            items["name"].append(missing_item["name"])
-            items["url"].append(missing_item["url"])
-        for index in range(len(items["url"])):
-            if (
-                not self.item_df["url"].isin([items["url"][index]]).any() and 
-                not list(filter(lambda x: x['url'] == items["url"][index], url_dict["Input Urls"]))
-            ):
-                self.item_df.loc[len(self.item_df)] = [items["name"][index], items["url"][index]]
-        self.item_df.to_excel("test.xlsx", sheet_name='Sheet1')
-
-    def _parse_items_list_soup(self, soup):
+        for name, url in self.iter_items():
+            item_columns["name"].append(name)
+            item_columns["url"].append(url)
+        self.item_df = pd.DataFrame(item_columns)
+        with profiler.time("write"):
+            with open_writer(self.output_file, ["name", "url"], self.file_format) as writer:
+                for name, url in zip(item_columns["name"], item_columns["url"]):
+                    writer.append({"name": name, "url": url})
+
+    def _parse_items_list_soup(self, soup, page_url=DEFAULT_BASE_URL):
         """
         Given a BeautifulSoup containing a table of items, this method will parse that table
         and return a dict of urls
         Args:
         soup (BeautifulSoup): The HTML BeautifulSoup to be parsed for items
+        page_url (str): The url of the page, which the links to the items are relative to
 
         Returns:
         dict: A dict containing the urls and names of the items parsed 
@@ -88,21 +117,24 @@ class ItemCollector():
             soup.findAll("span", class_="bg3wiki-itemicon") +
             soup.findAll("span", class_="bg3wiki-itemicon-wrapper")
         )
+        seen_urls = set()
         for item in item_list:
             for data in item.findAll("a"):
-                url = f"https://bg3.wiki{data.attrs['href']}"
-                if 'index' not in url and url not in return_dict["url"]:
+                url = urllib.parse.urljoin(page_url, data.attrs['href'])
+                if 'index' not in url and url not in seen_urls:
+                    seen_urls.add(url)
                     return_dict["url"].append(url)
                     return_dict["name"].append(data.attrs["title"])
         return return_dict
 
-    def _parse_items_special_soup(self, soup):
+    def _parse_items_special_soup(self, soup, page_url=DEFAULT_BASE_URL):
         """
         Given a BeautifulSoup containing a format of items (different than the majority), this 
         method will parse that format and return a dict of urls.
 
         Args:
         soup (BeautifulSoup): The HTML BeautifulSoup to be parsed for items
+        page_url (str): The url of the page, which the links to the items are relative to
 
         Returns:
         dict: A dict containing the urls and names of the items parsed.
@@ -114,10 +146,12 @@ class ItemCollector():
         remove_footer = soup.find("div", class_="navbox")
         if remove_footer:
             remove_footer.decompose()
+        seen_urls = set()
         for item in soup.findAll("span", class_="bg3wiki-icontext-icon"):
             for data in item.findAll("a"):
-                url = f"https://bg3.wiki{data.attrs['href']}"
-                if "Condition" not in url and url not in return_dict["url"]:
+                url = urllib.parse.urljoin(page_url, data.attrs['href'])
+                if "Condition" not in url and url not in seen_urls:
+                    seen_urls.add(url)
                     return_dict["url"].append(url)
                     return_dict["name"].append(data.attrs["title"])
         return return_dict
@@ -131,13 +165,13 @@ class ItemCollector():
         # Verify item is obtainable?
         for index, row in self.item_df.iterrows():
             try:
-                r = requests.get(row["url"], timeout=5)
+                r = self.fetcher.request(row["url"])
             except requests.exceptions.MissingSchema:
                 if row["name"] not in self.errors:
                     self.errors[row["name"]] = []
                 self.errors[row["name"]].append(f"Invalid URL: {row['url']}")
                 self.item_df.loc[index]["variation_data"] = None
-            except urllib3.exceptions.ReadTimeoutError:
+            except (urllib3.exceptions.ReadTimeoutError, requests.exceptions.Timeout):
                 if row["name"] not in self.errors:
                     self.errors[row["name"]] = []
                 self.errors[row["name"]].append(f"Timeout Error: {row['url']}")
@@ -0,0 +1,21 @@
+"""
+This file holds the ItemPage class, which parses a downloaded item page once and holds the parts of
+it that the extractors in parse_items need.
+
+Author: Raine Fuerst
+"""
+
+from bs4 import BeautifulSoup
+
+
+class ItemPage:
+    """
+    This class holds a parsed item page along with its property lists and description blockquotes,
+    so that every extractor can share a single parse of the page. Given a SoupStrainer, only the
+    parts of the page it matches are parsed.
+    """
+
+    def __init__(self, content, features='html5lib', parse_only=None):
+        self.soup = BeautifulSoup(content, features, parse_only=parse_only)
+        self.property_lists = self.soup.find_all("div", class_="bg3wiki-property-list")
+        self.blockquotes = self.soup.find_all("div", class_="bg3wiki-blockquote-text")
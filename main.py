@@ -1,17 +1,356 @@
 """
-This is the main file to handle passed in args and call parse_files.
+This is the main file to handle passed in args and run one of the commands:
+    parse: parse the items in an Excel file with parse_files
+    collect: collect the list of items from the wiki with ItemCollector
+    pipeline: collect the list of items and parse them as they are collected
+    merge: combine the output files of a sharded parse
+    serve: answer queries over the parsed items through a local HTTP/JSON endpoint
+
+The modules that do the work are only imported once the command is known, so that --help and
+mistyped arguments return straight away. Running main.py without a command picks collect for a
+.json input file and parse otherwise.
 
 Author: Raine Fuerst
 """
 
 import argparse
-from item_collector import ItemCollector
+import os
+import sys
+# sharding only imports the output writers once shards are merged
+from sharding import parse_shard
+
+
+COMMANDS = ["parse", "collect", "pipeline", "merge", "serve"]
+FORMATS = ["csv", "parquet", "sqlite", "xlsx"]
+
+
+def make_fetcher(args):
+    """
+    Creates the fetcher, along with its cache, rate controller, profiler, snapshots and connection
+    pool, from the arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments
+
+    Returns:
+        PageFetcher: The fetcher, an ApiFetcher if --api was given
+    """
+    # pylint: disable=import-outside-toplevel
+    from fetcher import PageFetcher
+    from page_cache import PageCache
+    from profiler import RunProfiler
+    from rate_control import RateController
+    from snapshot import Snapshot, SnapshotWriter
+    from transport import HttpTransport
+    cache = None
+    if args.cache_dir:
+        cache = PageCache(args.cache_dir, args.cache_size * 1024 * 1024, args.offline)
+    profiler = RunProfiler() if args.profile else None
+    rate = RateController(args.workers, latency_target=args.latency_target)
+    snapshot = Snapshot(args.replay) if args.replay else None
+    record = SnapshotWriter(args.record) if args.record else None
+    transport = HttpTransport(
+        args.per_host or args.workers, connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout
+    )
+    if args.api:
+        from api_fetcher import DEFAULT_API_URL, ApiFetcher
+        return ApiFetcher(
+            workers=args.workers, timeout=args.read_timeout, cache=cache, profiler=profiler,
+            rate=rate, retries=args.retries, api_url=args.api_url or DEFAULT_API_URL,
+            snapshot=snapshot, record=record, transport=transport
+        )
+    return PageFetcher(
+        workers=args.workers, timeout=args.read_timeout, cache=cache, profiler=profiler, rate=rate,
+        retries=args.retries, snapshot=snapshot, record=record, transport=transport
+    )
+
+
+def run_with_fetcher(args, command):
+    """
+    Runs the given command with a fetcher made from the arguments, then saves the cache and writes
+    the profile.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments
+        command (callable): Called with the fetcher
+    """
+    fetcher = make_fetcher(args)
+    try:
+        command(fetcher)
+    finally:
+        fetcher.close()
+        if args.profile:
+            fetcher.profiler.write(args.profile)
+
+
+def run_parse(args):
+    """
+    Parses the items in an Excel file.
+    """
+    # pylint: disable=import-outside-toplevel
+    from checkpoint import CheckpointJournal, ParseManifest
+    from parse_items import parse_files
+
+    def command(fetcher):
+        output_base = os.path.splitext(args.output_file)[0]
+        checkpoint = CheckpointJournal(
+            args.checkpoint or f"{output_base}.checkpoint.jsonl", args.resume
+        )
+        manifest = ParseManifest(
+            args.manifest or f"{output_base}.manifest.json", not args.full_parse
+        )
+        try:
+            parse_files(
+                args.input_file, args.output_file, args.empty_desc, fetcher, args.parse_workers,
+                checkpoint, manifest, args.format, args.excel_export, args.shard,
+                args.low_memory
+            )
+        finally:
+            checkpoint.close()
+            manifest.save()
+
+    run_with_fetcher(args, command)
+
+
+def run_collect(args):
+    """
+    Collects the list of items from the wiki pages in a JSON file.
+    """
+    from item_collector import ItemCollector  # pylint: disable=import-outside-toplevel
+    run_with_fetcher(
+        args,
+        lambda fetcher: ItemCollector(args.input_file, fetcher, args.output_file, args.format).run()
+    )
+
+
+def run_pipeline(args):
+    """
+    Collects the list of items from the wiki pages in a JSON file and parses them as they are
+    collected.
+    """
+    # pylint: disable=import-outside-toplevel
+    from item_collector import ItemCollector
+    from parse_items import parse_collected
+
+    def command(fetcher):
+        collector = ItemCollector(args.input_file, fetcher)
+        parse_collected(
+            collector.iter_items(), args.output_file, args.empty_desc, fetcher,
+            args.parse_workers, args.format
+        )
+        if collector.errors["Item Collection"]:
+            print("The following errors occurred during collection:")
+            for error in collector.errors["Item Collection"]:
+                print(f"\t{error}")
+
+    run_with_fetcher(args, command)
+
+
+def run_merge(args):
+    """
+    Combines the output files of a sharded parse.
+    """
+    from sharding import merge_shards  # pylint: disable=import-outside-toplevel
+    merge_shards(args.output_file, args.shards, args.errors, args.format)
+
+
+def run_serve(args):
+    """
+    Answers queries over the parsed items of an output file.
+    """
+    from query_service import QueryService  # pylint: disable=import-outside-toplevel
+    QueryService(args.output_file, args.checkpoint, args.format, args.interval).serve(
+        args.host, args.port
+    )
+
+
+def build_parser():
+    """
+    Returns the parser for the arguments of every command.
+    """
+    fetch_options = argparse.ArgumentParser(add_help=False)
+    fetch_options.add_argument(
+        "--workers", type=int, default=1, help="The number of pages to download at once."
+    )
+    fetch_options.add_argument(
+        "--retries", type=int, default=3,
+        help="The number of times a timed out, failed or throttled request is retried."
+    )
+    fetch_options.add_argument(
+        "--per_host", type=int,
+        help="The most connections open to a single host, defaults to the number of workers."
+    )
+    fetch_options.add_argument(
+        "--connect_timeout", type=float, default=3.05,
+        help="The seconds to wait for a connection to the wiki."
+    )
+    fetch_options.add_argument(
+        "--read_timeout", type=float, default=5.0,
+        help="The seconds to wait for the wiki to respond."
+    )
+    fetch_options.add_argument(
+        "--latency_target", type=float, default=2.0,
+        help="The response time in seconds above which fewer pages are downloaded at once."
+    )
+    fetch_options.add_argument(
+        "--cache_dir", help="The directory to cache downloaded pages in between runs."
+    )
+    fetch_options.add_argument(
+        "--cache_size", type=int, default=500, help="The size cap of the page cache in MB."
+    )
+    fetch_options.add_argument(
+        "--offline", action="store_true", help="Only read pages from the cache, never the wiki."
+    )
+    fetch_options.add_argument(
+        "--api", action="store_true",
+        help="Download pages through the MediaWiki API instead of as full HTML pages."
+    )
+    fetch_options.add_argument(
+        "--api_url", help="The MediaWiki API used by --api, defaults to the bg3.wiki API."
+    )
+    snapshot_options = fetch_options.add_mutually_exclusive_group()
+    snapshot_options.add_argument(
+        "--record", help="A snapshot file to record every fetched page to, for use with --replay."
+    )
+    snapshot_options.add_argument(
+        "--replay",
+        help="A snapshot file made with --record to read every page from instead of the wiki."
+    )
+    fetch_options.add_argument(
+        "--format", choices=FORMATS,
+        help="The format of the output files, defaults to the one matching the output file's "
+        "extension."
+    )
+    fetch_options.add_argument(
+        "--profile",
+        help="The file to write the time taken by each stage of the run to as JSON."
+    )
+    parse_options = argparse.ArgumentParser(add_help=False)
+    parse_options.add_argument("--empty_desc", action="store_true", help="Add this argument if an empty description is valid.")
+    parse_options.add_argument(
+        "--parse_workers", type=int, default=0,
+        help="The number of processes used to parse pages, 0 parses them in the main process."
+    )
 
-if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("input_file", help="The name of the input file to parse items for.")
-    parser.add_argument("output_file", help="The name of the file to output the results.")
-    parser.add_argument("--empty_desc", action="store_true", help="Add this argument if an empty description is valid.")
-    args = parser.parse_args()
-    collector = ItemCollector(args.input_file)
-    collector.run()
\ No newline at end of file
+    commands = parser.add_subparsers(dest="command", required=True)
+    parse = commands.add_parser(
+        "parse", parents=[fetch_options, parse_options],
+        help="Parse the items in an Excel file."
+    )
+    parse.add_argument("input_file", help="The name of the input file to parse items for.")
+    parse.add_argument("output_file", help="The name of the file to output the results.")
+    parse.add_argument(
+        "--checkpoint",
+        help="The journal to record parsed items in, defaults to the output file with a "
+        ".checkpoint.jsonl extension."
+    )
+    parse.add_argument(
+        "--resume", action="store_true", help="Skip items already recorded in the checkpoint."
+    )
+    parse.add_argument(
+        "--manifest",
+        help="The results of previous runs used to skip unchanged pages, defaults to the output "
+        "file with a .manifest.json extension."
+    )
+    parse.add_argument(
+        "--full_parse", action="store_true",
+        help="Parse every page, even the ones that have not changed since the last run."
+    )
+    parse.add_argument(
+        "--excel_export",
+        help="An Excel file to also write the parsed items to once the run is done."
+    )
+    parse.add_argument(
+        "--shard", type=parse_shard,
+        help="Only parse the pages in shard i of N, given as i/N with shards numbered from 0. "
+        "Combine the shards afterwards with the merge command."
+    )
+    parse.add_argument(
+        "--low_memory", action="store_true",
+        help="Keep as little as possible in memory for very large input files: errors are "
+        "printed as items finish and at most one downloaded page per worker waits to be parsed. "
+        "Needs a csv, parquet or sqlite output, xlsx output keeps every row until the end."
+    )
+    parse.set_defaults(func=run_parse)
+    collect = commands.add_parser(
+        "collect", parents=[fetch_options],
+        help="Collect the list of items from the wiki pages in a JSON file."
+    )
+    collect.add_argument("input_file", help="The JSON file listing the pages to collect from.")
+    collect.add_argument("output_file", help="The name of the file to output the items.")
+    # Collecting reads no descriptions, the flag is only accepted so that the original command line
+    # of main.py with a .json input keeps working
+    collect.add_argument("--empty_desc", action="store_true", help=argparse.SUPPRESS)
+    collect.set_defaults(func=run_collect)
+    pipeline = commands.add_parser(
+        "pipeline", parents=[fetch_options, parse_options],
+        help="Collect the list of items and parse every variation of them as they are collected."
+    )
+    pipeline.add_argument("input_file", help="The JSON file listing the pages to collect from.")
+    pipeline.add_argument("output_file", help="The name of the file to output the results.")
+    pipeline.set_defaults(func=run_pipeline)
+    merge = commands.add_parser("merge", help="Combine the output files of a sharded parse.")
+    merge.add_argument("output_file", help="The file to write the merged results to.")
+    merge.add_argument(
+        "--shards", nargs="+", required=True, help="The output files of every shard."
+    )
+    merge.add_argument(
+        "--errors", nargs="+",
+        help="The error files of every shard, defaults to the error files in ./output of a run "
+        "with as many shards as are given."
+    )
+    merge.add_argument(
+        "--format", choices=FORMATS,
+        help="The format of the files, defaults to the one matching the output file's extension."
+    )
+    merge.set_defaults(func=run_merge)
+    serve = commands.add_parser(
+        "serve", help="Answer queries over the parsed items through a local HTTP/JSON endpoint."
+    )
+    serve.add_argument("output_file", help="The output file of the parse command to serve.")
+    serve.add_argument(
+        "--checkpoint",
+        help="The checkpoint journal of the run writing the output file, its results are served "
+        "as soon as they are recorded."
+    )
+    serve.add_argument(
+        "--format", choices=FORMATS,
+        help="The format of the output file, defaults to the one matching its extension."
+    )
+    serve.add_argument("--host", default="127.0.0.1", help="The address to listen on.")
+    serve.add_argument("--port", type=int, default=8080, help="The port to listen on.")
+    serve.add_argument(
+        "--interval", type=float, default=2.0,
+        help="The seconds between checks for a new output file or checkpoint."
+    )
+    serve.set_defaults(func=run_serve)
+    return parser
+
+
+def main(argv):
+    """
+    Runs the command given by the arguments.
+
+    Args:
+        argv (list): The command line arguments, without the program name
+    """
+    # Without a command, keep the original behaviour of picking one from the input file
+    if argv and argv[0] not in COMMANDS and not argv[0].startswith("-"):
+        argv = ["collect" if argv[0].endswith(".json") else "parse", *argv]
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "offline", False) and not args.cache_dir:
+        parser.error("--offline requires --cache_dir")
+    if getattr(args, "replay", None) and not os.path.isfile(args.replay):
+        parser.error(f"The snapshot '{args.replay}' does not exist")
+    if getattr(args, "low_memory", False):
+        extension = os.path.splitext(args.output_file)[1].lower().lstrip(".")
+        if (args.format or extension) == "xlsx":
+            parser.error("--low_memory needs a csv, parquet or sqlite output, not xlsx")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,138 @@
+"""
+This file holds the PageCache class, which keeps downloaded wiki pages on disk so that they can be
+revalidated instead of downloaded again on the next run.
+
+Author: Raine Fuerst
+"""
+
+import collections
+import hashlib
+import json
+import os
+import threading
+
+
+class CacheMissError(Exception):
+    """
+    Raised when a page is requested in offline mode but is not in the cache.
+    """
+
+
+class PageCache:
+    """
+    This class handles storing pages on disk keyed by url, along with the ETag and Last-Modified
+    headers needed to revalidate them. The least recently used pages are removed once the cache
+    grows past its size cap.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir, max_bytes=None, offline=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.entries = collections.OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        index_path = os.path.join(cache_dir, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    if os.path.exists(self._body_path(entry["url"])):
+                        self.entries[entry["url"]] = entry
+                        self.total_bytes += entry["size"]
+        self._evict()
+
+    def _body_path(self, url):
+        """
+        Returns the path of the file holding the body of the given url.
+        """
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def conditional_headers(self, url):
+        """
+        Returns the headers used to revalidate the cached copy of the given url.
+
+        Args:
+            url (str): The url of the page
+
+        Returns:
+            dict: The If-None-Match/If-Modified-Since headers, empty if the url is not cached
+        """
+        headers = {}
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry:
+                if entry["etag"]:
+                    headers["If-None-Match"] = entry["etag"]
+                if entry["last_modified"]:
+                    headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, url):
+        """
+        Returns the cached body of the given url and marks it as recently used.
+
+        Args:
+            url (str): The url of the page
+
+        Returns:
+            bytes: The cached content of the page
+
+        Raises:
+            CacheMissError: If the url is not in the cache
+        """
+        with self.lock:
+            if url not in self.entries:
+                raise CacheMissError(url)
+            self.entries.move_to_end(url)
+            with open(self._body_path(url), "rb") as f:
+                return f.read()
+
+    def store(self, url, content, headers):
+        """
+        Stores the body of the given url, removing the least recently used pages if the cache is
+        over its size cap.
+
+        Args:
+            url (str): The url of the page
+            content (bytes): The content of the page
+            headers (dict): The response headers, used for the ETag and Last-Modified values
+        """
+        path = self._body_path(url)
+        with open(f"{path}.{threading.get_ident()}.tmp", "wb") as f:
+            f.write(content)
+        with self.lock:
+            os.replace(f"{path}.{threading.get_ident()}.tmp", path)
+            old_entry = self.entries.pop(url, None)
+            if old_entry:
+                self.total_bytes -= old_entry["size"]
+            self.entries[url] = {
+                "url": url,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "size": len(content),
+            }
+            self.total_bytes += len(content)
+            self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used pages until the cache is under its size cap. The most
+        recently used page is always kept.
+        """
+        while self.max_bytes and self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted["size"]
+            os.remove(self._body_path(evicted["url"]))
+
+    def save(self):
+        """
+        Writes the cache index to disk so the cache can be reused by the next run.
+        """
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with self.lock:
+            with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(list(self.entries.values()), f)
+        os.replace(f"{index_path}.tmp", index_path)
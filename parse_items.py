@@ -6,12 +6,20 @@ Author: Raine Fuerst
 """
 
 
+import collections
+import functools
+import os
 import re
+import time
 import chime
 import pandas
-import requests
-import urllib3
-from bs4 import BeautifulSoup
+from description import normalize_description
+from fetcher import PageFetcher
+from parsers import FEATURES, ItemParser
+from pipeline import Parsed, run_pipeline
+from records import ResultColumns
+from sharding import ROW_COLUMN, error_file_name, shard_of
+from writers import open_writer, output_format
 
 
 VALID_RARITIES = [
@@ -22,29 +30,48 @@ VALID_RARITIES = [
     "Legendary",
     "Story Item"
 ]
+RESULT_COLUMNS = ["rarity", "price_gp", "weight_lb", "description"]
+ERROR_COLUMNS = ["item_id", "category", "sub_category", "name", "variation", "url"]
+COLLECTED_COLUMNS = ["name", "variation", "url"]
+# Every category reads the same regions of the page, so one parser is shared by every page
+PARSER = ItemParser()
 
 
-def is_duplicate_variation(soup):
+def is_duplicate_variation(page):
     """
     Determines whether the variations are using the same chunk of data
 
     Args:
-        soup (BeautifulSoup): The html to be parsed for information
+        page (ItemPage): The parsed page to be checked
 
     Returns:
         bool: True, if the same data should be used, false otherwise
     """
-    line = soup.find_all("div", class_="bg3wiki-blockquote-text")
-    return True if "●" in str(line) else False
+    return True if "●" in str(page.blockquotes) else False
 
 
-def get_properties(soup, var_num):
+def variation_count(page):
+    """
+    Determines the number of variations of the item on the page.
+
+    Args:
+        page (ItemPage): The parsed page to be checked
+
+    Returns:
+        int: The number of variations, at least 1
+    """
+    if is_duplicate_variation(page):
+        return max(1, str(page.blockquotes).count("●"))
+    return max(1, len(page.property_lists), len(page.blockquotes))
+
+
+def get_properties(page, var_num):
     """
     Returns a dictionary containing all of the information under the "properties" section: rarity,
     weight, and price.
 
     Args:
-        soup (BeautifulSoup): The html to be parsed for information
+        page (ItemPage): The parsed page to be searched for information
         var_num (int): If there are multiple variations on the same item, this will determine which
             variation in the list to parse for. 
 
@@ -60,9 +87,9 @@ def get_properties(soup, var_num):
         "price": None,
         "errors": []
     }
-    prop = soup.find_all("div", class_="bg3wiki-property-list")
+    prop = page.property_lists
     if var_num > 1:
-        if is_duplicate_variation(soup):
+        if is_duplicate_variation(page):
             var_num = 1
     if len(prop) < var_num:
         ret_val["errors"].append("Error parsing HTML: Too few property lists")
@@ -97,12 +124,12 @@ def get_properties(soup, var_num):
                     ret_val["errors"].append(f"Invalid Price: {price_str}")
     return ret_val
 
-def get_description(soup, var_num, empty_desc):
+def get_description(page, var_num, empty_desc):
     """
     Returns a tuple containing the item's description and whether the description is valid.
 
     Args:
-        soup (BeautifulSoup): The html to be parsed for information
+        page (ItemPage): The parsed page to be searched for information
         var_num (int): If there are multiple variations on the same item, this will determine which
             variation in the list to parse for. 
         empty_desc (bool): True if empty descriptions are valid, False otherwise
@@ -113,31 +140,13 @@ def get_description(soup, var_num, empty_desc):
             bool: True if the description is valid, false otherwise
             string: The description if bool is true, the error string otherwise
     """
-    line = soup.find_all("div", class_="bg3wiki-blockquote-text")
-    line = [str(x).rsplit("●", maxsplit=1)[-1] for x in line]
+    line = [str(x).rsplit("●", maxsplit=1)[-1] for x in page.blockquotes]
     if len(line) < var_num:
         if empty_desc:
             line = ""
         else:
             return (False, f"Invalid Description: No description for the given variation: {var_num}")
-    description = str(line).rsplit("<p>", maxsplit=1)[-1]
-    description = description.rsplit("</p>", maxsplit=1)[0]
-    description = "".join([x.split(">")[-1] for x in description.split("<")])
-    description = description.split("[", maxsplit=1)[-1].rsplit("]", maxsplit=1)[0]
-    description = "".join(description.split("\\n"))
-    description = description.translate(str.maketrans("‘’“„", "''\"\"",  '\\'))
-    description = "'".join(description.split("''"))
-    if description.count("'") % 2 != 0:
-        description = "".join(description.split("'"))
-    if description.count('"') % 2 != 0:
-        description = "".join(description.split('"'))
-    if not re.match(r"^(?!\[)[^●]+(?<!])$", description):
-        for char in description:
-            if not re.match(r"^(?!\[)[^●]+(?<!])$", char):
-                return (False, f"Invalid Description: Invalid Character in Description: {char}")
-    if any (x in description for x in ["''", '""', "'\"", "\"'"]):
-        return(False, f"Invalid Description: Duplicate Quotes: {description}")
-    return (True, description)
+    return normalize_description(str(line))
 
 
 def percentage_message(index, total):
@@ -159,98 +168,359 @@ def percentage_message(index, total):
     print(f"{padding}{fraction}%", end=ending)
 
 
-def parse_files(input_file, output_file, empty_desc):
+def print_errors(errors, header=True):
+    """
+    Prints out the errors of every item.
+
+    Args:
+        errors (dict): The list of errors of each item, keyed by the item's name
+        header (bool): True to print the heading before the errors
+    """
+    if header:
+        print("The following errors occurred during parsing:")
+    for item, error_list in errors.items():
+        print(f"\t{item}")
+        for error in error_list:
+            print(f"\t\t{error}")
+
+
+def retry_on_permission_error(action, name):
+    """
+    Runs the given action, asking the user to try again once if the file it writes is locked, such
+    as by having it open in Excel.
+
+    Args:
+        action (callable): The action to run, called with no arguments
+        name (str): The name of the file shown to the user
+
+    Returns:
+        The return value of the action
+    """
+    try:
+        return action()
+    except(PermissionError):
+        chime.warning()
+        input(f"Permission Error with '{name}'\nPress any button to try again:")
+        return action()
+
+
+def extract_page(job, fetched, empty_desc):
+    """
+    Parses a single downloaded page once and extracts every requested variation of its item from
+    it. This runs in the parsing stage of the pipeline, which may be a separate process, so it only
+    takes picklable arguments.
+
+    Args:
+        job (tuple): The url of the page and the variations of the item to parse for (None for
+            every variation on the page, in order)
+        fetched (tuple): The content of the page and the error message returned by
+            PageFetcher.fetch
+        empty_desc (bool): True if empty descriptions are valid, False otherwise
+
+    Returns:
+        list: A Tuple(tuple, dict) for each variation, with the result of the variation and the
+            seconds spent on each stage.
+            tuple: The properties returned by get_properties, followed by the validity and the
+                description (or error string) returned by get_description
+            dict: The seconds spent extracting the variation, along with the seconds spent parsing
+                the page for the first variation. Empty if the page could not be downloaded
+    """
+    (_, variations) = job
+    (content, error) = fetched
+    if error:
+        return [
+            (({"rarity": None, "weight": None, "price": None, "errors": [error]}, False, None), {})
+            for _ in variations or [1]
+        ]
+    start = time.perf_counter()
+    page = PARSER.page(content)
+    parsed = time.perf_counter()
+    if variations is None:
+        variations = range(1, variation_count(page) + 1)
+    results = []
+    for variation in variations:
+        extract_start = time.perf_counter()
+        properties = get_properties(page, int(variation))
+        (desc_valid, desc) = get_description(page, int(variation), empty_desc)
+        timings = {"extract": time.perf_counter() - extract_start}
+        results.append(((properties, desc_valid, desc), timings))
+    # The tree is full of reference cycles, so it would otherwise stay in memory until the next
+    # garbage collection
+    page.soup.decompose()
+    results[0][1]["parse"] = parsed - start
+    return results
+
+
+def parse_files(
+        input_file, output_file, empty_desc, fetcher=None, parse_workers=0, checkpoint=None,
+        manifest=None, file_format=None, excel_export=None, shard=None, low_memory=False
+    ):
     """
-    Parses the given Excel file and creates a new Excel file with all of the missing information.
+    Parses the given Excel file and creates a new file with all of the missing information. Each
+    item is written to the output as soon as it is done, along with the items with errors, which
+    are written to an errors_file of the same format in ./output.
 
     Args:
         input_file (str): The excel file containing items to be parsed
-        output_file (str): The excel file to output the results into
+        output_file (str): The file to output the results into, its extension picks the format
         empty_desc (bool): True if empty descriptions are valid, False otherwise
+        fetcher (PageFetcher): The fetcher used to download the pages, a sequential one is used if
+            none is given
+        parse_workers (int): The number of processes used to parse the pages, 0 parses them in
+            this process
+        checkpoint (CheckpointJournal): The journal each parsed item is recorded in, items already
+            in the journal are not parsed again. Items whose page could not be downloaded are not
+            recorded, so that resuming tries them again
+        manifest (ParseManifest): The results of the previous run, items whose page has not
+            changed since then reuse their previous result instead of being parsed again
+        file_format (str): The format of the output files regardless of the extension, one of
+            csv, parquet, sqlite or xlsx
+        excel_export (str): An Excel file to also write every result to once the run is done
+        shard (tuple): The shard and the number of shards, from parse_shard. Only the rows of the
+            pages in this shard are parsed, and their position in the input file is written with
+            them so that merge_shards can combine the shards
+        low_memory (bool): True to print the errors of each item as soon as it is parsed instead
+            of keeping them until the end, and to hold half as many downloaded pages waiting to be
+            parsed, one per fetcher worker or parsing process. The xlsx writer keeps every row
+            until the file is closed, so the output must be in another format
+
+    Raises:
+        ValueError: If low_memory is used with an xlsx output
     """
+    if low_memory and output_format(output_file, file_format) == "xlsx":
+        raise ValueError(
+            "low_memory needs a csv, parquet or sqlite output, xlsx keeps every row in memory"
+        )
+    if fetcher is None:
+        fetcher = PageFetcher()
+    profiler = fetcher.profiler
     chime.theme('material')
     print("Parsing Beginning")
     excel_file = pandas.read_excel(input_file)
+    error_columns = ERROR_COLUMNS
+    if shard:
+        in_shard = [shard_of(url, shard[1]) == shard[0] for url in excel_file["url"]]
+        excel_file = excel_file[in_shard].rename_axis(ROW_COLUMN).reset_index()
+        error_columns = ERROR_COLUMNS + [ROW_COLUMN]
+        print(f"Shard {shard[0]}/{shard[1]}: {len(excel_file)} items")
     urls = excel_file["url"]
     variations = excel_file["variation"]
-    data = {
-        "rarities": [None] * len(urls),
-        "weights": [None] * len(urls),
-        "prices": [None] * len(urls),
-        "desc": [None] * len(urls)
-    }
+    # Only the Excel export needs every result at the end, the outputs are written row by row
+    results_columns = ResultColumns(len(urls), VALID_RARITIES) if excel_export else None
     errors = {}
-    item_errors = {
-        "item_id": [],
-        "category": [],
-        "sub_category": [],
-        "name": [],
-        "variation": [],
-        "url": [],
-    }
-    for index, url in enumerate(urls):
-        properties = {
-            "rarity": None,
-            "weight": None,
-            "price": None,
-            "errors": []
-        }
+    printed_errors = False
+    input_rows = (dict(zip(excel_file.columns, x)) for x in excel_file.itertuples(False, None))
+    columns = list(excel_file.columns) + [x for x in RESULT_COLUMNS if x not in excel_file.columns]
+    file_format = output_format(output_file, file_format)
+    error_file = error_file_name(file_format, shard)
+    writer = retry_on_permission_error(
+        lambda: open_writer(output_file, columns, file_format), output_file
+    )
+    error_writer = retry_on_permission_error(
+        lambda: open_writer(error_file, error_columns, file_format), os.path.basename(error_file)
+    )
+    profiler.note("html_parser", FEATURES)
+    rows = list(zip(urls, variations))
+    resumed = [checkpoint.get(*row) if checkpoint else None for row in rows]
+    if checkpoint and any(resumed):
+        print(f"Resuming: {sum(1 for x in resumed if x)} items already parsed")
+    # Every variation of an item is on the same page, so the rows are grouped by page and each
+    # page is downloaded and parsed once for all of them
+    pages = {}
+    for index, (url, _) in enumerate(rows):
+        if not resumed[index]:
+            pages.setdefault(url, []).append(index)
+    jobs = [(url, tuple(variations[x] for x in indexes)) for url, indexes in pages.items()]
+    page_rows = list(pages.values())
+    row_jobs = {x: n for n, indexes in enumerate(page_rows) for x in indexes}
+    fingerprints = {}
+    reused = set()
+    # The jobs whose page could not be downloaded, their error rows are not kept between runs
+    failed = set()
+
+    def download(job):
+        fetched = fetcher.fetch(job[0])
+        if fetched[0] is None:
+            failed.add(job)
+        return fetched
+
+    def fetch_job(job):
+        # When the revision id is known up front, unchanged pages are not downloaded at all
+        fetched = None
+        revision_id = fetcher.revision_id(job[0]) if manifest else None
+        if revision_id is None:
+            fetched = download(job)
+            if manifest is None or fetched[0] is None:
+                return fetched
+        fingerprint = manifest.fingerprint(fetched and fetched[0], empty_desc, revision_id)
+        previous = [manifest.lookup(job[0], x, fingerprint) for x in job[1]]
+        if None not in previous:
+            reused.add(job)
+            fingerprints[job] = fingerprint
+            return Parsed([(x, {}) for x in previous])
+        if fetched is None:
+            fetched = download(job)
+        # A page that could not be downloaded has no result to keep for the next run
+        if fetched[0] is not None:
+            fingerprints[job] = fingerprint
+        return fetched
+
+    fetcher.prepare(job[0] for job in jobs)
+    results = run_pipeline(
+        fetcher,
+        jobs,
+        fetch_job,
+        functools.partial(extract_page, empty_desc=empty_desc),
+        parse_workers,
+        (parse_workers or fetcher.workers) if low_memory else None
+    )
+    # Pages are in the order of their first row, so the page of a row that has not been seen yet
+    # is always the next one
+    page_results = {}
+    for index, row in enumerate(rows):
         percentage_message(index, len(urls))
-        try:
-            r = requests.get(url, timeout=5)
-            properties = get_properties(
-                BeautifulSoup(r.content, 'html5lib'), int(variations[index])
-            )
-            (desc_valid, desc) = get_description(
-                BeautifulSoup(r.content, 'html5lib'), int(variations[index]), empty_desc
-            )
-        except requests.exceptions.MissingSchema:
-            properties["errors"].append(f"Invalid URL: {url}")
-            desc_valid = False
-        except urllib3.exceptions.ReadTimeoutError:
-            properties["errors"].append(f"Timeout Error: {url}")
-            desc_valid = False
-        # except Exception as error:
-        #     properties["errors"].append(f"Misc Error: {error}: {url}")
-        #     desc_valid = False
-
-        data["rarities"][index] = properties["rarity"]
-        data["prices"][index] = properties["price"]
-        data["weights"][index] = properties["weight"]
-        
+        if resumed[index]:
+            (properties, desc_valid, desc) = resumed[index]
+        else:
+            if index not in page_results:
+                page_results.update(zip(page_rows[row_jobs[index]], next(results)))
+            ((properties, desc_valid, desc), timings) = page_results.pop(index)
+            for stage, seconds in timings.items():
+                profiler.record(stage, seconds, row[0])
+            job = jobs[row_jobs[index]]
+            if checkpoint and job not in failed:
+                checkpoint.record(*row, (properties, desc_valid, desc))
+            if job in fingerprints and job not in failed:
+                manifest.update(
+                    *row, fingerprints[job], (properties, desc_valid, desc), job in reused
+                )
+
+        input_row = next(input_rows)
+        if results_columns:
+            results_columns.set(index, properties, desc if desc_valid else None)
         if properties["errors"] or not desc_valid:
-            item_errors["item_id"].append(excel_file["item_id"][index])
-            item_errors["category"].append(excel_file["category"][index])
-            item_errors["sub_category"].append(excel_file["sub_category"][index])
-            item_errors["name"].append(excel_file["name"][index])
-            item_errors["variation"].append(excel_file["variation"][index])
-            item_errors["url"].append(excel_file["url"][index])
-            errors[excel_file["name"][index]] = properties["errors"] if properties["errors"] else [desc] 
-        if desc_valid:
-            data["desc"][index] = desc
-    excel_file["rarity"] = data["rarities"]
-    excel_file["price_gp"] = data ["prices"]
-    excel_file["weight_lb"] = data["weights"]
-    excel_file["description"] = data["desc"]
-    try:
-        excel_file.to_excel(output_file, sheet_name='Sheet1')
-    except(PermissionError):
-        chime.warning()
-        input(f"Permission Error with '{output_file}'\nPress any button to try again:")
-        excel_file.to_excel(output_file, sheet_name='Sheet1')
-    print("The following errors occurred during parsing:")
-    for item, error_list in errors.items():
-        print(f"\t{item}")
-        for error in error_list:
-            print(f"\t\t{error}")
-    error_file = pandas.DataFrame(item_errors)
-    try:        
-        error_file.to_excel('./output/errors_file.xlsx', sheet_name='Sheet1')
-    except(PermissionError):
-        chime.warning()
-        input("Permission Error with 'errors_file.xlsx'\nPress any button to try again:")
-        error_file.to_excel('./output/errors_file.xlsx', sheet_name='Sheet1')
-    print("Created 'errors_file.xlsx' with all of the items with errors.")
+            with profiler.time("write"):
+                error_writer.append(input_row)
+            item_errors = {
+                input_row["name"]: properties["errors"] if properties["errors"] else [desc]
+            }
+            if low_memory:
+                print()
+                print_errors(item_errors, not printed_errors)
+                printed_errors = True
+            else:
+                errors.update(item_errors)
+        with profiler.time("write"):
+            writer.append({
+                **input_row,
+                "rarity": properties["rarity"],
+                "price_gp": properties["price"],
+                "weight_lb": properties["weight"],
+                "description": desc if desc_valid else None,
+            })
+        profiler.item_done()
+    if manifest:
+        print(
+            f"Reused {manifest.reused} unchanged items and parsed {manifest.recomputed} changed "
+            "or new items"
+        )
+    with profiler.time("write"):
+        retry_on_permission_error(writer.close, output_file)
+    if excel_export:
+        excel_file["rarity"] = results_columns.rarity_column()
+        excel_file["price_gp"] = results_columns.price_column()
+        excel_file["weight_lb"] = results_columns.weight_column()
+        excel_file["description"] = results_columns.descriptions
+        with profiler.time("write"):
+            retry_on_permission_error(
+                lambda: excel_file.to_excel(excel_export, sheet_name='Sheet1'), excel_export
+            )
+    if not printed_errors:
+        print_errors(errors)
+    with profiler.time("write"):
+        retry_on_permission_error(error_writer.close, os.path.basename(error_file))
+    print(f"Created '{os.path.basename(error_file)}' with all of the items with errors.")
     chime.success()
 
 
+def parse_collected(
+        items, output_file, empty_desc, fetcher=None, parse_workers=0, file_format=None
+    ):
+    """
+    Parses every variation of the given items as they arrive, such as from
+    ItemCollector.iter_items, and creates a new file with their information. Items are parsed while
+    the rest are still being collected, and each one is written to the output as soon as it is done.
+
+    Args:
+        items (iterable): The name and url of each item
+        output_file (str): The file to output the results into, its extension picks the format
+        empty_desc (bool): True if empty descriptions are valid, False otherwise
+        fetcher (PageFetcher): The fetcher used to download the pages, a sequential one is used if
+            none is given
+        parse_workers (int): The number of processes used to parse the pages, 0 parses them in
+            this process
+        file_format (str): The format of the output files regardless of the extension, one of
+            csv, parquet, sqlite or xlsx
+    """
+    if fetcher is None:
+        fetcher = PageFetcher()
+    profiler = fetcher.profiler
+    chime.theme('material')
+    print("Parsing Beginning")
+    file_format = output_format(output_file, file_format)
+    error_file = error_file_name(file_format)
+    writer = retry_on_permission_error(
+        lambda: open_writer(output_file, COLLECTED_COLUMNS + RESULT_COLUMNS, file_format),
+        output_file
+    )
+    error_writer = retry_on_permission_error(
+        lambda: open_writer(error_file, COLLECTED_COLUMNS, file_format),
+        os.path.basename(error_file)
+    )
+    profiler.note("html_parser", FEATURES)
+    # The items whose pages are in the pipeline, in the order their results come out
+    pending = collections.deque()
+
+    def jobs():
+        for (name, url) in items:
+            pending.append((name, url))
+            yield (url, None)
+
+    results = run_pipeline(
+        fetcher,
+        jobs(),
+        lambda job: fetcher.fetch(job[0]),
+        functools.partial(extract_page, empty_desc=empty_desc),
+        parse_workers
+    )
+    errors = {}
+    count = 0
+    for page_results in results:
+        (name, url) = pending.popleft()
+        for variation, (result, timings) in enumerate(page_results, start=1):
+            (properties, desc_valid, desc) = result
+            for stage, seconds in timings.items():
+                profiler.record(stage, seconds, url)
+            row = {"name": name, "variation": variation, "url": url}
+            with profiler.time("write"):
+                if properties["errors"] or not desc_valid:
+                    error_writer.append(row)
+                    errors[name] = properties["errors"] if properties["errors"] else [desc]
+                writer.append({
+                    **row,
+                    "rarity": properties["rarity"],
+                    "price_gp": properties["price"],
+                    "weight_lb": properties["weight"],
+                    "description": desc if desc_valid else None,
+                })
+            profiler.item_done()
+            count += 1
+            print(f"{count} items parsed", end="\r")
+    print(f"{count} items parsed")
+    with profiler.time("write"):
+        retry_on_permission_error(writer.close, output_file)
+    print_errors(errors)
+    with profiler.time("write"):
+        retry_on_permission_error(error_writer.close, os.path.basename(error_file))
+    print(f"Created '{os.path.basename(error_file)}' with all of the items with errors.")
+    chime.success()
@@ -0,0 +1,17 @@
+"""
+This package holds the ItemParser class hierarchy, with one parser for each category of BG3 items.
+The child classes are still placeholders without any parsing of their own, so every page is parsed
+with ItemParser.
+
+Author: Raine Fuerst
+"""
+
+from parsers.accessory_parser import AccessoryParser
+from parsers.armour_parser import ArmourParser
+from parsers.camp_supplies_parser import CampSuppliesParser
+from parsers.consumable_parser import ConsumableParser
+from parsers.equipment_parser import EquipmentParser
+from parsers.item_parser import FEATURES, ItemParser
+from parsers.shield_parser import ShieldParser
+from parsers.weapon_parser import WeaponParser
+from parsers.writing_parser import WritingParser
@@ -4,13 +4,10 @@ handles the parsing of Rings, Amulets, Cloaks, Footwear, Handwear, and Headwear.
 
 @Author: Raine Fuerst
 """
-from equipment_parser import EquipmentParser
+from parsers.equipment_parser import EquipmentParser
 
 class AccessoryParser(EquipmentParser):
     """
     This class handles the parsing of properties specific to Rings, Amulets, Cloaks, Footwear, 
     Handwear, and Headwear.
     """
-
-    def __init__(self):
-        pass
\ No newline at end of file
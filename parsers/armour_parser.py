@@ -4,12 +4,9 @@ handles the parsing of Armour and Clothing.
 
 @Author: Raine Fuerst
 """
-from equipment_parser import EquipmentParser
+from parsers.equipment_parser import EquipmentParser
 
 class ArmourParser(EquipmentParser):
     """
     This class handles the parsing of properties specific to Armour/Clothing.
     """
-
-    def __init__(self):
-        pass
\ No newline at end of file
@@ -4,12 +4,9 @@ the parsing of Camp Supplies.
 
 @Author: Raine Fuerst
 """
-from item_parser import ItemParser
+from parsers.item_parser import ItemParser
 
 class CampSuppliesParser(ItemParser):
     """
     This class handles the parsing of properties specific to Camp Supplies.
     """
-
-    def __init__(self):
-        pass
@@ -4,12 +4,9 @@ the parsing of Consumables.
 
 @Author: Raine Fuerst
 """
-from item_parser import ItemParser
+from parsers.item_parser import ItemParser
 
 class ConsumableParser(ItemParser):
     """
     This class handles the parsing of properties specific to Consumables.
     """
-
-    def __init__(self):
-        pass
\ No newline at end of file
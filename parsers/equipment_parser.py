@@ -5,13 +5,10 @@ Instruments, and Headwear.
 
 @Author: Raine Fuerst
 """
-from item_parser import ItemParser
+from parsers.item_parser import ItemParser
 
 class EquipmentParser(ItemParser):
     """
     This class handles the parsing of properties specific to Clothing, Armour, Shields, Weapons, 
     Rings, Amulets, Cloaks, Footwear, Handwear, Instruments, and Headwear.
     """
-
-    def __init__(self):
-        pass
\ No newline at end of file
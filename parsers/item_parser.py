@@ -1,14 +1,46 @@
 """
 This file holds the ItemParser class, which is the parent class to handle the parsing of BG3 items
-from the wiki.
+from the wiki. Pages are parsed with lxml, an optional dependency, when it is installed and with
+html.parser otherwise, instead of the html5lib used elsewhere. The results match the html5lib parse
+for pages that declare their charset, as every bg3.wiki page and ApiFetcher body does.
 
 @Author: Raine Fuerst
 """
+from bs4 import SoupStrainer
+from bs4.builder import builder_registry
+from item_page import ItemPage
+
+# html5lib builds a full DOM and cannot skip parts of the page. The backend used is noted in the
+# --profile report
+FEATURES = "lxml" if builder_registry.lookup("lxml") else "html.parser"
 
 class ItemParser:
     """
-    This parent class handles the parsing of basic properites for BG3 items from the wiki.
+    This parent class handles the parsing of basic properites for BG3 items from the wiki. Only
+    the regions of the page in REGIONS are parsed. Every item page is parsed with this class, as
+    the extractors read the same regions for every category.
     """
 
-    def __init__(self):
-        pass
+    # The classes of the divs holding the properties and the description
+    REGIONS = ["bg3wiki-property-list", "bg3wiki-blockquote-text"]
+
+    def strainer(self):
+        """
+        Returns a SoupStrainer matching the regions of the page needed by this parser.
+
+        Returns:
+            SoupStrainer: The strainer matching every div with one of the classes in REGIONS
+        """
+        return SoupStrainer("div", class_=self.REGIONS)
+
+    def page(self, content):
+        """
+        Parses the regions of the given item page needed by this parser.
+
+        Args:
+            content (bytes): The HTML of the item page
+
+        Returns:
+            ItemPage: The parsed page, holding only the regions in REGIONS
+        """
+        return ItemPage(content, FEATURES, self.strainer())
@@ -4,12 +4,9 @@ handles the parsing of Shields.
 
 @Author: Raine Fuerst
 """
-from equipment_parser import EquipmentParser
+from parsers.equipment_parser import EquipmentParser
 
 class ShieldParser(EquipmentParser):
     """
     This class handles the parsing of properties specific to Shields.
     """
-
-    def __init__(self):
-        pass
\ No newline at end of file
@@ -4,12 +4,9 @@ handles the parsing of Weapons.
 
 @Author: Raine Fuerst
 """
-from equipment_parser import EquipmentParser
+from parsers.equipment_parser import EquipmentParser
 
 class WeaponParser(EquipmentParser):
     """
     This class handles the parsing of properties specific to Weapons.
     """
-
-    def __init__(self):
-        pass
\ No newline at end of file
@@ -4,12 +4,9 @@ the parsing of Books and Notes.
 
 @Author: Raine Fuerst
 """
-from item_parser import ItemParser
+from parsers.item_parser import ItemParser
 
 class WritingParser(ItemParser):
     """
     This class handles the parsing of properties specific to Books/Notes.
     """
-
-    def __init__(self):
-        pass
@@ -0,0 +1,79 @@
+"""
+This file holds run_pipeline, which connects the downloading of pages to their parsing so that the
+two stages run at the same time.
+
+Author: Raine Fuerst
+"""
+
+import collections
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+class Parsed:
+    """
+    Returned by the fetching stage in place of the fetched data when the result of a job is already
+    known, so that the job skips the parsing stage.
+    """
+
+    def __init__(self, result):
+        self.result = result
+
+
+def run_pipeline(fetcher, jobs, fetch, parse, parse_workers=0, queue_size=None):
+    """
+    Runs every job through a fetching stage and a parsing stage. The fetching stage runs on the
+    fetcher's threads and hands its results to the parsing stage through a bounded queue, so
+    fetching pauses when parsing falls behind. The parsing stage runs in a pool of processes so that
+    it is not held back by the GIL.
+
+    Args:
+        fetcher (PageFetcher): The fetcher whose workers run the fetching stage
+        jobs (iterable): The jobs to run, which may still be arriving while earlier jobs run
+        fetch (callable): Called with a job on a fetcher thread, returns the fetched data or a
+            Parsed holding the job's result
+        parse (callable): Called with a job and its fetched data in a worker process, must be
+            picklable
+        parse_workers (int): The number of parsing processes, 0 parses in this process instead
+        queue_size (int): The number of fetched jobs that can wait to be parsed, defaults to twice
+            the number of parsing processes. When parsing in this process it bounds the jobs the
+            fetcher works ahead on instead, which defaults to twice the number of its workers
+
+    Yields:
+        The result of parse for each job, in the same order as jobs
+    """
+    def fetch_job(job):
+        return (job, fetch(job))
+
+    if parse_workers < 1:
+        for job, fetched in fetcher.map(fetch_job, jobs, queue_size):
+            yield fetched.result if isinstance(fetched, Parsed) else parse(job, fetched)
+        return
+    fetched_queue = queue.Queue(maxsize=queue_size if queue_size else parse_workers * 2)
+
+    def fetch_stage():
+        try:
+            for item in fetcher.map(fetch_job, jobs):
+                fetched_queue.put(item)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            fetched_queue.put((None, error))
+        else:
+            fetched_queue.put(None)
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as executor:
+        threading.Thread(target=fetch_stage, daemon=True).start()
+        pending = collections.deque()
+        while (item := fetched_queue.get()) is not None:
+            (job, fetched) = item
+            if job is None:
+                raise fetched
+            if isinstance(fetched, Parsed):
+                pending.append(Future())
+                pending[-1].set_result(fetched.result)
+            else:
+                pending.append(executor.submit(parse, job, fetched))
+            while len(pending) >= parse_workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,186 @@
+"""
+This file holds the RunProfiler class, which records how long each stage of a run takes, and the
+NullProfiler class, which is used in its place when profiling is turned off.
+
+Author: Raine Fuerst
+"""
+
+import bisect
+import collections
+import contextlib
+import json
+import threading
+import time
+
+
+# The upper bounds in seconds of the histogram buckets, the last bucket holds everything slower
+HISTOGRAM_BOUNDS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+def percentile(samples, fraction):
+    """
+    Returns the given percentile of the sorted samples using the nearest-rank method.
+
+    Args:
+        samples (list): The sorted samples
+        fraction (float): The percentile as a fraction, 0.5 for the median
+
+    Returns:
+        float: The sample at the given percentile, 0 if there are no samples
+    """
+    if not samples:
+        return 0
+    return samples[max(0, int(len(samples) * fraction + 0.5) - 1)]
+
+
+class NullProfiler:
+    """
+    This class has the same methods as RunProfiler but records nothing, so that code can always
+    call the profiler without checking whether profiling is turned on.
+    """
+
+    def record(self, stage, seconds, url=None, size=None):
+        """
+        Does nothing.
+        """
+
+    def time(self, stage, url=None):  # pylint: disable=unused-argument
+        """
+        Does nothing.
+        """
+        return contextlib.nullcontext()
+
+    def item_done(self):
+        """
+        Does nothing.
+        """
+
+    def note(self, name, value):
+        """
+        Does nothing.
+        """
+
+
+class RunProfiler(NullProfiler):
+    """
+    This class records the time taken by every stage of a run, per url where there is one, and
+    summarizes them into percentiles, histograms, the slowest urls and the throughput.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = collections.defaultdict(list)
+        self.urls = collections.defaultdict(lambda: collections.defaultdict(float))
+        self.items = 0
+        self.bytes = 0
+        self.notes = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds, url=None, size=None):
+        """
+        Records the time taken by a stage.
+
+        Args:
+            stage (str): The name of the stage, such as "fetch", "parse", "extract" or "write"
+            seconds (float): The time the stage took
+            url (str): The url the stage was run for, if any
+            size (int): The size of the response in bytes, for the fetch stage
+        """
+        with self.lock:
+            self.stages[stage].append(seconds)
+            if url is not None:
+                self.urls[url][stage] += seconds
+                if size is not None:
+                    self.urls[url]["size"] = int(self.urls[url]["size"]) + size
+            if size is not None:
+                self.bytes += size
+
+    @contextlib.contextmanager
+    def time(self, stage, url=None):
+        """
+        Records the time taken by the body of a with statement.
+
+        Args:
+            stage (str): The name of the stage
+            url (str): The url the stage was run for, if any
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, url)
+
+    def item_done(self):
+        """
+        Counts an item as finished, for the throughput.
+        """
+        with self.lock:
+            self.items += 1
+
+    def note(self, name, value):
+        """
+        Adds a value to the summary, for statistics kept by other parts of the run.
+
+        Args:
+            name (str): The key of the value in the summary
+            value: The value, which must be JSON serializable
+        """
+        with self.lock:
+            self.notes[name] = value
+
+    def summary(self, slowest=10):
+        """
+        Returns a summary of everything recorded so far.
+
+        Args:
+            slowest (int): The number of slowest urls to include
+
+        Returns:
+            dict: The wall time, throughput, bytes downloaded, per stage statistics, slowest urls
+                and noted values
+        """
+        wall_seconds = time.perf_counter() - self.start
+        stages = {}
+        with self.lock:
+            for stage, samples in self.stages.items():
+                samples = sorted(samples)
+                histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+                for sample in samples:
+                    histogram[bisect.bisect_left(HISTOGRAM_BOUNDS, sample)] += 1
+                stages[stage] = {
+                    "count": len(samples),
+                    "total": sum(samples),
+                    "mean": sum(samples) / len(samples),
+                    "p50": percentile(samples, 0.5),
+                    "p95": percentile(samples, 0.95),
+                    "p99": percentile(samples, 0.99),
+                    "max": samples[-1],
+                    "histogram": [
+                        {"le": bound, "count": count}
+                        for bound, count in zip(HISTOGRAM_BOUNDS + ["inf"], histogram)
+                    ],
+                }
+            urls = sorted(
+                self.urls.items(),
+                key=lambda x: sum(v for k, v in x[1].items() if k != "size"),
+                reverse=True
+            )
+            return {
+                "wall_seconds": wall_seconds,
+                "items": self.items,
+                "items_per_sec": self.items / wall_seconds if wall_seconds else 0,
+                "bytes": self.bytes,
+                "stages": stages,
+                "slowest_urls": [{"url": url, **timings} for url, timings in urls[:slowest]],
+                **self.notes,
+            }
+
+    def write(self, path):
+        """
+        Writes the summary to the given file as JSON.
+
+        Args:
+            path (str): The file to write to
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=4)
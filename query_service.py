@@ -0,0 +1,381 @@
+"""
+This file holds the ItemIndex class, which indexes the parsed results of parse_files for fast
+lookups, and the QueryService class, which answers lookups and filter queries over them through a
+local HTTP/JSON endpoint. The service loads the results once, then reloads them in the background
+whenever the output file or the checkpoint journal of a run changes. It is started with the serve
+command of main.py.
+
+Endpoints:
+    GET /items: the items matching every given filter, with the parameters
+        name, url, category, sub_category, rarity: exact matches, case insensitive except for the
+            url, repeat a parameter to match any of its values
+        min_price, max_price, min_weight, max_weight: inclusive ranges of price_gp and weight_lb
+        limit: the most items to return, defaults to DEFAULT_LIMIT, 0 returns every match
+    GET /status: the number of items, the files they were loaded from and when
+
+Author: Raine Fuerst
+"""
+
+import bisect
+import datetime
+import json
+import math
+import os
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from checkpoint import read_journal
+from writers import read_rows
+
+
+# The columns indexed for exact lookups
+KEY_COLUMNS = ["name", "url", "category", "sub_category", "rarity"]
+# The columns indexed for range queries, keyed by the name of their query parameters
+RANGE_COLUMNS = {"price": "price_gp", "weight": "weight_lb"}
+DEFAULT_LIMIT = 100
+
+
+def _key(column, value):
+    """
+    Returns the key the given value is indexed under, urls are case sensitive.
+    """
+    value = str(value).strip()
+    return value if column == "url" else value.casefold()
+
+
+def _number(value):
+    """
+    Returns the given value as a number, None if it is empty or not a number.
+    """
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or math.isnan(value):
+        return None
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def clean_row(row):
+    """
+    Returns the given output row with empty cells as None and the prices and weights as numbers,
+    as every output format stores them differently.
+
+    Args:
+        row (dict): A row read back from an output file
+
+    Returns:
+        dict: The cleaned row
+    """
+    row = {
+        k: None if v == "" or (isinstance(v, float) and math.isnan(v)) else v
+        for k, v in row.items()
+    }
+    for column in RANGE_COLUMNS.values():
+        if column in row:
+            row[column] = _number(row[column])
+    return row
+
+
+def apply_checkpoint(rows, records):
+    """
+    Updates the results of the given rows with the ones recorded in a checkpoint journal, which
+    are newer than the output file while a run is still going. Records matching no row, such as
+    the items parsed since an xlsx output was last written, are added as rows of their own.
+
+    Args:
+        rows (list): The cleaned output rows
+        records (dict): The records of the journal from read_journal
+    """
+    matched = set()
+    for row in rows:
+        try:
+            key = (row.get("url"), float(row.get("variation")))
+        except (TypeError, ValueError):
+            continue
+        if key in records:
+            matched.add(key)
+            _apply_record(row, records[key])
+    columns = list(rows[0]) if rows else []
+    for key, record in records.items():
+        if key not in matched:
+            row = dict.fromkeys(columns)
+            row.update(url=record["url"], variation=record["variation"])
+            rows.append(_apply_record(row, record))
+
+
+def _apply_record(row, record):
+    """
+    Sets the results of the given row to the ones of a checkpoint journal record.
+
+    Returns:
+        dict: The updated row
+    """
+    row["rarity"] = record["rarity"]
+    row["price_gp"] = _number(record["price"])
+    row["weight_lb"] = _number(record["weight"])
+    row["description"] = record["desc"] if record["desc_valid"] else None
+    return row
+
+
+class ItemIndex:
+    """
+    This class holds the parsed items along with a hash index for each column in KEY_COLUMNS and a
+    sorted index for each column in RANGE_COLUMNS. Items are returned in the order of the output
+    file.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.keys = {x: {} for x in KEY_COLUMNS}
+        for position, row in enumerate(rows):
+            for column in KEY_COLUMNS:
+                if row.get(column) is not None:
+                    self.keys[column].setdefault(_key(column, row[column]), []).append(position)
+        self.ranges = {}
+        for column in RANGE_COLUMNS.values():
+            pairs = sorted(
+                (row[column], position) for position, row in enumerate(rows)
+                if row.get(column) is not None
+            )
+            self.ranges[column] = ([x[0] for x in pairs], [x[1] for x in pairs])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def lookup(self, column, values):
+        """
+        Returns the positions of the items whose value in the given column is one of the values.
+
+        Args:
+            column (str): One of KEY_COLUMNS
+            values (list): The values to match
+
+        Returns:
+            set: The positions of the matching items
+        """
+        index = self.keys[column]
+        return {x for value in values for x in index.get(_key(column, value), [])}
+
+    def between(self, column, low=None, high=None):
+        """
+        Returns the positions of the items whose value in the given column is in a range.
+
+        Args:
+            column (str): One of the columns in RANGE_COLUMNS
+            low (float): The lowest value, inclusive, None for no lower bound
+            high (float): The highest value, inclusive, None for no upper bound
+
+        Returns:
+            set: The positions of the matching items
+        """
+        (values, positions) = self.ranges[column]
+        start = bisect.bisect_left(values, low) if low is not None else 0
+        end = bisect.bisect_right(values, high) if high is not None else len(values)
+        return set(positions[start:end])
+
+    def query(self, keys=None, ranges=None):
+        """
+        Returns the items matching every given filter.
+
+        Args:
+            keys (dict): The values to match for columns in KEY_COLUMNS
+            ranges (dict): The (low, high) range to match for columns in RANGE_COLUMNS
+
+        Returns:
+            list: The matching items, in the order of the output file
+        """
+        matches = [self.lookup(column, values) for column, values in (keys or {}).items()]
+        matches += [self.between(column, *bounds) for column, bounds in (ranges or {}).items()]
+        if not matches:
+            return list(self.rows)
+        # Intersecting from the smallest set keeps the work proportional to the matches
+        matches.sort(key=len)
+        positions = matches[0].intersection(*matches[1:])
+        return [self.rows[x] for x in sorted(positions)]
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    This class answers the requests of the QueryService, which is the server's service attribute.
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answers a GET request with JSON.
+        """
+        request = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(request.query)
+        service = self.server.service
+        try:
+            if request.path == "/items":
+                self._send(200, service.items(params))
+            elif request.path == "/status":
+                self._send(200, service.status())
+            else:
+                self._send(404, {"error": f"Unknown endpoint: {request.path}"})
+        except ValueError as error:
+            self._send(400, {"error": str(error)})
+
+    def _send(self, status, body):
+        """
+        Sends the given body as a JSON response.
+        """
+        content = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Does not log every request, which would slow down the lookups.
+        """
+
+
+class QueryService:
+    """
+    This class keeps the ItemIndex of an output file of parse_files, along with the results of the
+    checkpoint journal of its run if one is given. A background thread checks the files every
+    interval seconds and rebuilds the index when they change, lookups keep using the previous index
+    until the new one is ready.
+    """
+
+    def __init__(self, output_file, checkpoint=None, file_format=None, interval=2.0):
+        self.output_file = output_file
+        self.checkpoint = checkpoint
+        self.file_format = file_format
+        self.interval = interval
+        self.index = None
+        self.signature = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.stopped = threading.Event()
+        self.reload()
+
+    def _signature(self):
+        """
+        Returns the modification time and size of the output file and the checkpoint journal.
+        """
+        signature = []
+        for path in [self.output_file, self.checkpoint]:
+            try:
+                stat = os.stat(path) if path else None
+            except FileNotFoundError:
+                stat = None
+            signature.append((stat.st_mtime_ns, stat.st_size) if stat else None)
+        return tuple(signature)
+
+    def reload(self):
+        """
+        Reads the output file and the checkpoint journal and replaces the index. An output file
+        that does not exist yet, before a run writes it, holds no items.
+        """
+        signature = self._signature()
+        start = time.perf_counter()
+        rows = []
+        if os.path.exists(self.output_file):
+            rows = [clean_row(x) for x in read_rows(self.output_file, self.file_format)[1]]
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            apply_checkpoint(rows, read_journal(self.checkpoint)[0])
+        self.index = ItemIndex(rows)
+        self.signature = signature
+        self.loaded_at = datetime.datetime.now().isoformat(timespec="seconds")
+        print(f"Loaded {len(rows)} items in {time.perf_counter() - start:.2f}s")
+
+    def watch(self):
+        """
+        Reloads the index whenever the files change, until the service is stopped.
+        """
+        while not self.stopped.wait(self.interval):
+            signature = self._signature()
+            if signature == self.signature:
+                continue
+            try:
+                self.reload()
+                self.reloads += 1
+            except Exception as error:  # pylint: disable=broad-except
+                # The file may still be being written, it is tried again once it changes
+                self.signature = signature
+                print(f"Reload failed, keeping the previous items: {error}")
+
+    def items(self, params):
+        """
+        Returns the response to an /items query.
+
+        Args:
+            params (dict): The query parameters, each with a list of values
+
+        Returns:
+            dict: The number of matching items and the items themselves, up to the limit
+
+        Raises:
+            ValueError: If a parameter is unknown or not a valid number
+        """
+        keys = {}
+        bounds = {}
+        limit = DEFAULT_LIMIT
+        for param, values in params.items():
+            if param in KEY_COLUMNS:
+                keys[param] = values
+            elif param == "limit":
+                try:
+                    limit = int(values[-1])
+                except ValueError as error:
+                    raise ValueError(f"Invalid number for {param}: {values[-1]}") from error
+                if limit < 0:
+                    raise ValueError(f"Invalid number for {param}: {values[-1]}")
+            elif param[4:] in RANGE_COLUMNS and param[:4] in ("min_", "max_"):
+                try:
+                    number = float(values[-1])
+                except ValueError as error:
+                    raise ValueError(f"Invalid number for {param}: {values[-1]}") from error
+                if not math.isfinite(number):
+                    raise ValueError(f"Invalid number for {param}: {values[-1]}")
+                bounds.setdefault(RANGE_COLUMNS[param[4:]], {})[param[:4]] = number
+            else:
+                raise ValueError(f"Unknown parameter: {param}")
+        ranges = {k: (v.get("min_"), v.get("max_")) for k, v in bounds.items()}
+        start = time.perf_counter()
+        matches = self.index.query(keys, ranges)
+        return {
+            "count": len(matches),
+            "items": matches[:limit] if limit > 0 else matches,
+            "ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def status(self):
+        """
+        Returns the response to a /status query.
+        """
+        return {
+            "items": len(self.index),
+            "output_file": self.output_file,
+            "checkpoint": self.checkpoint,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+        }
+
+    def serve(self, host="127.0.0.1", port=8080):
+        """
+        Answers queries until interrupted.
+
+        Args:
+            host (str): The address to listen on
+            port (int): The port to listen on
+        """
+        server = ThreadingHTTPServer((host, port), QueryHandler)
+        server.service = self
+        watcher = threading.Thread(target=self.watch, daemon=True)
+        watcher.start()
+        print(f"Serving {len(self.index)} items on http://{host}:{server.server_port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopped.set()
+            server.server_close()
@@ -0,0 +1,158 @@
+"""
+This file holds the RateController class, which decides how many requests can be sent to the wiki
+at once and how long to wait before retrying a failed one, and the CircuitOpenError raised while
+the wiki is failing too often to be sent requests.
+
+Author: Raine Fuerst
+"""
+
+import email.utils
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while the circuit breaker is open.
+    """
+
+
+def parse_retry_after(value):
+    """
+    Returns the number of seconds to wait given by a Retry-After header.
+
+    Args:
+        value (str): The value of the header, either a number of seconds or an HTTP date
+
+    Returns:
+        float: The seconds to wait, or None if there is no valid header
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class RateController:
+    """
+    This class limits the number of requests in flight using additive increase and multiplicative
+    decrease: the limit grows by about one request per round of successful requests and is halved
+    when a request is throttled, fails, or is slower than the latency target. It also spaces out
+    retries with jittered exponential backoff, pauses every request while a Retry-After is in
+    effect, and opens a circuit breaker after too many failures in a row. While the circuit is open
+    requests fail straight away, once the cooldown has passed a single request is let through to
+    test whether the wiki has recovered.
+    """
+
+    def __init__(
+            self, max_concurrency, min_concurrency=1, latency_target=2.0, backoff_base=0.5,
+            backoff_max=30.0, failure_threshold=10, cooldown=30.0
+        ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.latency_target = latency_target
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self.last_decrease = 0.0
+        self.failures = 0
+        self.open_until = None
+        self.probing = False
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Waits until another request can be sent.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+        """
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.open_until is not None:
+                    if now < self.open_until or self.probing:
+                        raise CircuitOpenError()
+                    # Half open, only this request is sent until it succeeds or fails
+                    self.probing = True
+                    self.in_flight += 1
+                    return
+                if now < self.resume_at:
+                    self.condition.wait(self.resume_at - now)
+                elif self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                else:
+                    self.condition.wait()
+
+    def release(self, latency, success):
+        """
+        Records the outcome of a request sent after acquire() and adjusts the limit.
+
+        Args:
+            latency (float): The seconds the request took
+            success (bool): True if the request succeeded, False if it was throttled or failed
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.probing = False
+            now = time.monotonic()
+            if success:
+                self.failures = 0
+                self.open_until = None
+                if latency > self.latency_target:
+                    self._decrease(now)
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            else:
+                self.failures += 1
+                self._decrease(now)
+                if self.open_until is not None or self.failures >= self.failure_threshold:
+                    self.open_until = now + self.cooldown
+            self.condition.notify_all()
+
+    def _decrease(self, now):
+        """
+        Halves the limit, at most once per latency target so that the requests that were already in
+        flight when the wiki slowed down do not each halve it again.
+        """
+        if now - self.last_decrease >= self.latency_target:
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            self.last_decrease = now
+
+    def pause(self, seconds):
+        """
+        Holds back every request for the given number of seconds, for a Retry-After header.
+
+        Args:
+            seconds (float): The seconds to wait
+        """
+        with self.condition:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Returns the seconds to wait before retrying a request.
+
+        Args:
+            attempt (int): The number of times the request has been retried already
+            retry_after (float): The seconds given by the Retry-After header of the response, if any
+
+        Returns:
+            float: A random delay of up to backoff_base * 2^attempt seconds capped at backoff_max,
+                or the Retry-After if it is longer
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
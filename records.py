@@ -0,0 +1,64 @@
+"""
+This file holds the ResultColumns class, which keeps the parsed results of every item in compact
+arrays instead of lists of Python objects.
+
+Author: Raine Fuerst
+"""
+
+import math
+from array import array
+
+
+class ResultColumns:
+    """
+    This class stores the rarity, price, weight and description of every item by row. Rarities
+    are stored as one byte codes and prices and weights as doubles, with NaN for missing values,
+    which takes a fraction of the memory of lists of Python objects.
+    """
+
+    __slots__ = ("rarities", "rarity_codes", "prices", "weights", "descriptions")
+
+    def __init__(self, size, rarities):
+        self.rarities = list(rarities)
+        self.rarity_codes = array("b", [-1]) * size
+        self.prices = array("d", [math.nan]) * size
+        self.weights = array("d", [math.nan]) * size
+        self.descriptions = [None] * size
+
+    def set(self, index, properties, desc):
+        """
+        Stores the results of the item in the given row.
+
+        Args:
+            index (int): The row of the item
+            properties (dict): The properties returned by get_properties
+            desc (str): The description of the item, None if it is not valid
+        """
+        rarity = properties["rarity"]
+        if rarity is not None:
+            if rarity not in self.rarities:
+                self.rarities.append(rarity)
+            self.rarity_codes[index] = self.rarities.index(rarity)
+        if properties["price"] is not None:
+            self.prices[index] = properties["price"]
+        if properties["weight"] is not None:
+            self.weights[index] = properties["weight"]
+        self.descriptions[index] = desc
+
+    def rarity_column(self):
+        """
+        Returns the rarity of every item, None where it is missing.
+        """
+        return [self.rarities[x] if x != -1 else None for x in self.rarity_codes]
+
+    def price_column(self):
+        """
+        Returns the price of every item as an int, None where it is missing.
+        """
+        return [None if math.isnan(x) else int(x) for x in self.prices]
+
+    def weight_column(self):
+        """
+        Returns the weight of every item, None where it is missing.
+        """
+        return [None if math.isnan(x) else x for x in self.weights]
@@ -0,0 +1,119 @@
+"""
+This file holds the functions that split a run of parse_files into shards that can run on separate
+processes or machines, and merge_shards, which combines the output files of every shard into the
+same output files a single run would have made. The shards are merged with the merge command of
+main.py.
+
+Author: Raine Fuerst
+"""
+
+import zlib
+
+
+# The position of the row in the input file, written by shards so that merging can restore the order
+ROW_COLUMN = "input_row"
+
+
+def shard_of(url, shard_count):
+    """
+    Returns the shard the given url belongs to. The hash is stable between processes and machines,
+    unlike hash(), and every row of the same page is in the same shard.
+
+    Args:
+        url (str): The url of the item's page
+        shard_count (int): The number of shards
+
+    Returns:
+        int: The shard, from 0 to shard_count - 1
+    """
+    return zlib.crc32(str(url).encode("utf-8")) % shard_count
+
+
+def parse_shard(value):
+    """
+    Parses a shard given as "i/N", where shards are numbered from 0 to N - 1.
+
+    Args:
+        value (str): The shard to parse
+
+    Returns:
+        Tuple(int, int): The shard and the number of shards
+
+    Raises:
+        ValueError: If the value is not a valid shard
+    """
+    (shard, _, shard_count) = value.partition("/")
+    (shard, shard_count) = (int(shard), int(shard_count))
+    if shard_count < 1 or not 0 <= shard < shard_count:
+        raise ValueError(f"Invalid shard '{value}', expected i/N with 0 <= i < N")
+    return (shard, shard_count)
+
+
+def error_file_name(file_format, shard=None):
+    """
+    Returns the file parse_files writes the items with errors to.
+
+    Args:
+        file_format (str): The format of the output files
+        shard (tuple): The shard and the number of shards, if the run is a shard
+
+    Returns:
+        str: The path of the error file
+    """
+    if shard is None:
+        return f"./output/errors_file.{file_format}"
+    return f"./output/errors_file.{shard[0]}-of-{shard[1]}.{file_format}"
+
+
+def _merge(shard_files, output_file, file_format):
+    """
+    Writes the rows of every shard file to the output file in the order of the input file.
+
+    Returns:
+        int: The number of rows written
+    """
+    from writers import open_writer, read_rows  # pylint: disable=import-outside-toplevel
+    columns = None
+    rows = []
+    for shard_file in shard_files:
+        (shard_columns, shard_rows) = read_rows(shard_file, file_format)
+        if columns is None:
+            columns = shard_columns
+        elif shard_columns != columns:
+            raise ValueError(f"The columns of '{shard_file}' do not match the other shards")
+        rows.extend(shard_rows)
+    rows.sort(key=lambda x: int(x[ROW_COLUMN]))
+    positions = [int(x[ROW_COLUMN]) for x in rows]
+    if len(set(positions)) != len(positions):
+        raise ValueError("The same row is in more than one shard file")
+    columns = [x for x in columns or [] if x != ROW_COLUMN]
+    with open_writer(output_file, columns, file_format) as writer:
+        for row in rows:
+            writer.append(row)
+    return len(rows)
+
+
+def merge_shards(output_file, shard_files, error_files=None, file_format=None):
+    """
+    Combines the output files and error files of every shard into the output file and error file
+    of a single run, with the rows in the same order as the input file.
+
+    Args:
+        output_file (str): The file to write the merged results to
+        shard_files (list): The output files of the shards
+        error_files (list): The error files of the shards, defaults to the error files in ./output
+            of every shard of a run with as many shards as shard_files
+        file_format (str): The format of the files regardless of their extension, if any
+    """
+    from writers import output_format  # pylint: disable=import-outside-toplevel
+    file_format = output_format(output_file, file_format)
+    if error_files is None:
+        # Error files of a run with a different number of shards may still be in ./output
+        count = len(shard_files)
+        error_files = [error_file_name(file_format, (x, count)) for x in range(count)]
+    rows = _merge(shard_files, output_file, file_format)
+    error_rows = _merge(error_files, error_file_name(file_format), file_format)
+    print(
+        f"Merged {rows} items and {error_rows} items with errors from {len(shard_files)} shards "
+        f"into '{output_file}'"
+    )
@@ -0,0 +1,138 @@
+"""
+This file holds the snapshot archive classes. SnapshotWriter records every page fetched during a
+run into a single file, and Snapshot reads them back so that a later run can replay the same pages
+without any network access.
+
+A snapshot file starts with MAGIC, followed by the zlib compressed body of every page, then the
+zlib compressed JSON index mapping each url to the offset and length of its body, or to the error
+its download failed with. It ends with the offset and length of the index and MAGIC again.
+
+Author: Raine Fuerst
+"""
+
+import datetime
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+
+MAGIC = b"BG3SNAP1"
+# The offset and length of the index, followed by MAGIC
+FOOTER = struct.Struct("<QQ8s")
+
+
+class SnapshotError(Exception):
+    """
+    Raised when a file is not a valid snapshot.
+    """
+
+
+class SnapshotWriter:
+    """
+    This class records fetched pages into a snapshot file. Pages can be added from several threads
+    at once. The file is written under a temporary name and only replaces the snapshot once it is
+    closed, so an interrupted run never leaves a broken snapshot behind.
+    """
+
+    def __init__(self, path, level=6):
+        self.path = path
+        self.level = level
+        self.index = {}
+        self.lock = threading.Lock()
+        self.file = open(f"{path}.tmp", "wb")
+        self.file.write(MAGIC)
+
+    def add(self, url, content, error=None):
+        """
+        Records the result of fetching the given url. A url added more than once keeps its last
+        result.
+
+        Args:
+            url (str): The url of the page
+            content (bytes): The content of the page, None if the download failed
+            error (str): The error message of the download, None if it succeeded
+        """
+        if content is None:
+            with self.lock:
+                self.index[url] = {"error": error}
+            return
+        compressed = zlib.compress(content, self.level)
+        with self.lock:
+            offset = self.file.tell()
+            self.file.write(compressed)
+            self.index[url] = {"offset": offset, "length": len(compressed), "size": len(content)}
+
+    def close(self):
+        """
+        Writes the index and moves the finished snapshot into place.
+        """
+        with self.lock:
+            if self.file.closed:
+                return
+            index = zlib.compress(json.dumps({
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "pages": self.index,
+            }).encode("utf-8"))
+            offset = self.file.tell()
+            self.file.write(index)
+            self.file.write(FOOTER.pack(offset, len(index), MAGIC))
+            self.file.close()
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+class Snapshot:
+    """
+    This class reads pages from a snapshot file. The file is memory-mapped, so only the bodies that
+    are read are loaded and the pages can be read from several threads at once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as error:
+                raise SnapshotError(f"'{path}' is empty") from error
+        if len(self.map) < len(MAGIC) + FOOTER.size or self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise SnapshotError(f"'{path}' is not a snapshot")
+        (offset, length, magic) = FOOTER.unpack_from(self.map, len(self.map) - FOOTER.size)
+        if magic != MAGIC:
+            self.map.close()
+            raise SnapshotError(f"'{path}' is not a finished snapshot")
+        index = json.loads(zlib.decompress(self.map[offset:offset + length]))
+        self.created = index["created"]
+        self.pages = index["pages"]
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __contains__(self, url):
+        return url in self.pages
+
+    def fetch(self, url):
+        """
+        Returns the recorded result of fetching the given url.
+
+        Args:
+            url (str): The url of the page
+
+        Returns:
+            tuple: The content of the page (None on failure) and the error message (None on
+                success), in the same form as PageFetcher.fetch
+        """
+        entry = self.pages.get(url)
+        if entry is None:
+            return (None, f"Not In Snapshot: {url}")
+        if "error" in entry:
+            return (None, entry["error"])
+        return (zlib.decompress(self.map[entry["offset"]:entry["offset"] + entry["length"]]), None)
+
+    def close(self):
+        """
+        Unmaps the snapshot file.
+        """
+        self.map.close()
@@ -0,0 +1,28 @@
+"""
+This file holds the fixtures shared by the tests, which run against a SyntheticWiki served from the
+test process instead of the real wiki.
+
+Author: Raine Fuerst
+"""
+
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# pylint: disable=wrong-import-position
+from synthetic_wiki import SyntheticWiki
+
+
+@pytest.fixture
+def wiki():
+    """
+    Serves a SyntheticWiki of 120 items with small pages for the duration of a test.
+    """
+    synthetic_wiki = SyntheticWiki(items=120, page_kb=1)
+    synthetic_wiki.start()
+    yield synthetic_wiki
+    synthetic_wiki.stop()
@@ -0,0 +1,65 @@
+"""
+This file tests the ApiFetcher against the MediaWiki API stub of the SyntheticWiki.
+
+Author: Raine Fuerst
+"""
+
+from api_fetcher import ApiFetcher
+from item_page import ItemPage
+from parse_items import extract_page
+
+
+def make_fetcher(wiki):
+    """
+    Returns an ApiFetcher sending its API requests to the given wiki.
+    """
+    return ApiFetcher(workers=4, api_url=f"{wiki.base_url}/w/api.php")
+
+
+def test_prepare_batches_revision_lookups(wiki):
+    wiki.revisions["Item 7"] = 42
+    urls = [f"{wiki.base_url}/wiki/Item_{x}" for x in range(wiki.items)]
+    # Duplicates are only looked up once, missing pages have no revision id
+    urls += urls[:10] + [f"{wiki.base_url}/wiki/Item_999"]
+    fetcher = make_fetcher(wiki)
+    fetcher.prepare(urls)
+    assert [len(x) for x in wiki.queries] == [ApiFetcher.BATCH_SIZE, ApiFetcher.BATCH_SIZE, 21]
+    assert fetcher.revision_id(f"{wiki.base_url}/wiki/Item_0") == 1
+    assert fetcher.revision_id(f"{wiki.base_url}/wiki/Item_7") == 42
+    assert fetcher.revision_id(f"{wiki.base_url}/wiki/Item_999") is None
+    fetcher.close()
+
+
+def test_parse_path_extracts_every_variation(wiki):
+    # Item 4 has three variations sharing one property list, separated by ●
+    url = f"{wiki.base_url}/wiki/Item_4"
+    fetcher = make_fetcher(wiki)
+    (content, error) = fetcher.fetch(url)
+    fetcher.close()
+    assert error is None
+    # html5lib guesses the encoding of undeclared bytes, the body has to declare utf-8
+    assert "●" in str(ItemPage(content).blockquotes)
+    results = extract_page((url, None), (content, None), False)
+    assert len(results) == 3
+    for variation, ((properties, desc_valid, desc), _) in enumerate(results, start=1):
+        assert properties["errors"] == []
+        assert properties["rarity"] is not None
+        assert desc_valid
+        assert f"variation {variation}" in desc
+
+
+def test_missing_page_is_an_api_error(wiki):
+    url = f"{wiki.base_url}/wiki/Item_999"
+    fetcher = make_fetcher(wiki)
+    assert fetcher.fetch(url) == (None, f"API Error: missingtitle: {url}")
+    fetcher.close()
+
+
+def test_nan_url_is_an_invalid_url(wiki):
+    # Empty url cells of the input file are read as NaN
+    url = float("nan")
+    fetcher = make_fetcher(wiki)
+    fetcher.prepare([url, f"{wiki.base_url}/wiki/Item_0"])
+    assert fetcher.revision_id(url) is None
+    assert fetcher.fetch(url) == (None, "Invalid URL: nan")
+    fetcher.close()
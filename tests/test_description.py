@@ -0,0 +1,79 @@
+"""
+This file tests that normalize_description and normalize_descriptions give the same results as
+the split and join implementation get_description used before them, on seeded random blockquote
+texts built from the characters and tags the normalization treats specially.
+
+Author: Raine Fuerst
+"""
+
+import random
+import re
+import pandas
+from description import normalize_description, normalize_descriptions
+
+PIECES = [
+    "a", "b", " ", "x y", "<", ">", "<p>", "</p>", "<i>", "</i>", "<br>", "[", "]", "●", "'", '"',
+    "‘", "’", "“", "„", "”", "\\", "\\n", "\n"
+]
+
+
+def split_join_description(line):
+    """
+    Returns the description and its validity the way get_description computed them before
+    normalize_description.
+    """
+    description = str(line).rsplit("<p>", maxsplit=1)[-1]
+    description = description.rsplit("</p>", maxsplit=1)[0]
+    description = "".join([x.split(">")[-1] for x in description.split("<")])
+    description = description.split("[", maxsplit=1)[-1].rsplit("]", maxsplit=1)[0]
+    description = "".join(description.split("\\n"))
+    description = description.translate(str.maketrans("‘’“„", "''\"\"", '\\'))
+    description = "'".join(description.split("''"))
+    if description.count("'") % 2 != 0:
+        description = "".join(description.split("'"))
+    if description.count('"') % 2 != 0:
+        description = "".join(description.split('"'))
+    if not re.match(r"^(?!\[)[^●]+(?<!])$", description):
+        for char in description:
+            if not re.match(r"^(?!\[)[^●]+(?<!])$", char):
+                return (False, f"Invalid Description: Invalid Character in Description: {char}")
+    if any(x in description for x in ["''", '""', "'\"", "\"'"]):
+        return (False, f"Invalid Description: Duplicate Quotes: {description}")
+    return (True, description)
+
+
+def random_raws(count, seed=0):
+    """
+    Returns the given number of random raw texts, half of them in the string form of a list of
+    blockquote texts like get_description builds.
+    """
+    rng = random.Random(seed)
+    raws = []
+    for _ in range(count):
+        size = rng.randint(0, 14)
+        if rng.random() < 0.5:
+            lines = [
+                "".join(rng.choice(PIECES) for _ in range(size)) for _ in range(rng.randint(0, 3))
+            ]
+            raws.append(str(lines))
+        else:
+            raws.append("".join(rng.choice(PIECES) for _ in range(size)))
+    return raws
+
+
+def test_normalize_description_matches_split_join():
+    for raw in random_raws(50000):
+        assert normalize_description(raw) == split_join_description(raw), raw
+
+
+def test_normalize_descriptions_matches_split_join():
+    raws = pandas.Series(random_raws(5000, seed=1))
+    results = normalize_descriptions(raws)
+    for raw, valid, description in zip(raws, results["valid"], results["description"]):
+        assert (bool(valid), description) == split_join_description(raw), raw
+
+
+def test_blockquote_description():
+    raw = str([' <i>A bottle of crimson dye.</i>\n</p>'])
+    assert normalize_description(raw) == (True, " A bottle of crimson dye.")
+    assert split_join_description(raw) == (True, " A bottle of crimson dye.")
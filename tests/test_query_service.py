@@ -0,0 +1,47 @@
+"""
+This file tests that the QueryService serves the results of a run that is still going: before its
+output file exists, and with the items of its checkpoint journal that are not in the output yet.
+
+Author: Raine Fuerst
+"""
+
+from checkpoint import CheckpointJournal
+from query_service import QueryService
+from writers import open_writer
+
+COLUMNS = ["name", "url", "variation", "rarity", "price_gp", "weight_lb", "description"]
+
+
+def record(journal, url, price):
+    """
+    Records a parsed item with the given price in the journal.
+    """
+    properties = {"rarity": "Rare", "weight": 1.5, "price": price, "errors": []}
+    journal.record(url, 1, (properties, True, "A description"))
+
+
+def test_missing_output_file_holds_no_items(tmp_path):
+    service = QueryService(str(tmp_path / "output.csv"))
+    assert service.status()["items"] == 0
+    assert service.items({})["count"] == 0
+
+
+def test_journal_records_without_output_rows_are_added(tmp_path):
+    output_file = str(tmp_path / "output.csv")
+    with open_writer(output_file, COLUMNS) as writer:
+        writer.append({
+            "name": "Amulet", "url": "https://wiki/Amulet", "variation": 1, "rarity": "Common",
+            "price_gp": 10, "weight_lb": 0.5, "description": ""
+        })
+    journal = CheckpointJournal(str(tmp_path / "output.checkpoint.jsonl"))
+    record(journal, "https://wiki/Amulet", 20)
+    record(journal, "https://wiki/Sword", 30)
+    journal.close()
+    service = QueryService(output_file, journal.path)
+    items = service.items({})["items"]
+    assert [(x["url"], x["price_gp"], x["rarity"]) for x in items] == [
+        ("https://wiki/Amulet", 20, "Rare"),
+        ("https://wiki/Sword", 30, "Rare"),
+    ]
+    assert items[1]["name"] is None
+    assert service.items({"min_price": ["25"]})["count"] == 1
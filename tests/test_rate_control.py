@@ -0,0 +1,112 @@
+"""
+This file tests the RateController on its own and through a PageFetcher against the faults of the
+SyntheticWiki: throttling with a Retry-After, a full outage and the recovery from it.
+
+Author: Raine Fuerst
+"""
+
+import random
+import time
+import pytest
+from fetcher import PageFetcher
+from rate_control import CircuitOpenError, RateController
+
+
+def test_limit_halves_on_failure_and_grows_back():
+    rate = RateController(8, latency_target=1.0)
+    rate.acquire()
+    rate.release(0.01, False)
+    assert rate.limit == 4
+    # Requests that were already in flight do not halve the limit again
+    rate.acquire()
+    rate.release(0.01, False)
+    assert rate.limit == 4
+    for _ in range(4):
+        rate.acquire()
+        rate.release(0.01, True)
+    assert rate.limit == pytest.approx(5, abs=0.1)
+
+
+def test_slow_responses_lower_the_limit():
+    rate = RateController(8, latency_target=0.5)
+    rate.acquire()
+    rate.release(0.6, True)
+    assert rate.limit == 4
+    assert rate.failures == 0
+
+
+def test_backoff_is_jittered_exponential_and_capped():
+    rate = RateController(1, backoff_base=0.5, backoff_max=4.0)
+    random.seed(0)
+    for attempt in range(8):
+        delays = [rate.backoff(attempt) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= min(4.0, 0.5 * 2 ** attempt)
+        # The delays are spread out rather than all retrying at the same moment
+        assert len(set(delays)) == len(delays)
+    assert rate.backoff(0, retry_after=3.0) == 3.0
+
+
+def test_retry_after_is_waited_for(wiki):
+    wiki.throttled = 1
+    wiki.retry_after = 0.5
+    rate = RateController(4, backoff_base=0.01)
+    fetcher = PageFetcher(workers=4, rate=rate)
+    start = time.perf_counter()
+    (content, error) = fetcher.fetch(f"{wiki.base_url}/wiki/Item_0")
+    fetcher.close()
+    assert error is None and content
+    assert time.perf_counter() - start >= 0.5
+    assert wiki.requests == 2
+    # Halved by the 429, then grown again by the retry that succeeded
+    assert rate.limit == 2.5
+
+
+def test_throttling_gives_up_after_the_retries(wiki):
+    wiki.throttled = 10
+    wiki.retry_after = 0
+    fetcher = PageFetcher(retries=2, rate=RateController(1, backoff_base=0.01))
+    url = f"{wiki.base_url}/wiki/Item_0"
+    assert fetcher.fetch(url) == (None, f"HTTP Error 429: {url}")
+    fetcher.close()
+    assert wiki.requests == 3
+
+
+def test_outage_opens_the_circuit_until_a_probe_succeeds(wiki):
+    rate = RateController(2, failure_threshold=3, cooldown=0.3, backoff_base=0.01)
+    fetcher = PageFetcher(workers=2, retries=0, rate=rate)
+    url = f"{wiki.base_url}/wiki/Item_0"
+    wiki.down = True
+    for _ in range(3):
+        assert fetcher.fetch(url) == (None, f"HTTP Error 503: {url}")
+    # The circuit is open, requests fail without reaching the wiki
+    assert fetcher.fetch(url) == (None, f"Too Many Failures: {url}")
+    assert wiki.requests == 3
+    wiki.down = False
+    time.sleep(0.3)
+    (content, error) = fetcher.fetch(url)
+    fetcher.close()
+    assert error is None and content
+    assert wiki.requests == 4
+    assert rate.open_until is None
+
+
+def test_half_open_lets_a_single_probe_through():
+    rate = RateController(4, failure_threshold=1, cooldown=0.2)
+    rate.acquire()
+    rate.release(0.01, False)
+    with pytest.raises(CircuitOpenError):
+        rate.acquire()
+    time.sleep(0.2)
+    rate.acquire()
+    # Only the probe is sent until it comes back
+    with pytest.raises(CircuitOpenError):
+        rate.acquire()
+    # A failed probe opens the circuit for another cooldown
+    rate.release(0.01, False)
+    with pytest.raises(CircuitOpenError):
+        rate.acquire()
+    time.sleep(0.2)
+    rate.acquire()
+    rate.release(0.01, True)
+    rate.acquire()
+    rate.acquire()
@@ -0,0 +1,101 @@
+"""
+This file holds the HttpTransport class, which sends every request of a PageFetcher through a
+shared pool of keep-alive connections so that requests to the same host reuse their connection
+instead of opening a new one each time.
+
+Author: Raine Fuerst
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+
+class HttpTransport:
+    """
+    This class handles a connection pool shared by every thread. Each thread gets its own
+    requests.Session, as sessions are not thread safe, but every session sends its requests
+    through the same HTTPAdapter and so through the same pool. At most per_host connections are
+    open to a host at once, a request waits for a free connection rather than opening another
+    one. Responses are requested compressed with every encoding urllib3 can decode, gzip and
+    deflate always and brotli when the brotli package is installed.
+    """
+
+    def __init__(self, per_host=10, hosts=10, connect_timeout=3.05, read_timeout=5):
+        self.per_host = max(1, per_host)
+        self.timeout = (connect_timeout, read_timeout)
+        self.adapter = HTTPAdapter(
+            pool_connections=hosts, pool_maxsize=self.per_host, pool_block=True, max_retries=0
+        )
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.sessions = []
+
+    def session(self):
+        """
+        Returns the session of the calling thread, creating it on first use.
+
+        Returns:
+            requests.Session: The session, whose requests go through the shared pool
+        """
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self.local.session = session
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def get(self, url, params=None, headers=None):
+        """
+        Sends a GET request through the pool.
+
+        Args:
+            url (str): The url to request
+            params (dict): The query parameters of the request
+            headers (dict): The headers of the request
+
+        Returns:
+            requests.Response: The response
+        """
+        return self.session().get(url, params=params, headers=headers, timeout=self.timeout)
+
+    def stats(self):
+        """
+        Returns the number of requests sent and connections opened so far, per host and in total.
+        Hosts whose pool has been dropped to make room for another host are not counted.
+
+        Returns:
+            dict: The requests, connections and the fraction of requests that reused a connection
+        """
+        pools = self.adapter.poolmanager.pools
+        hosts = {}
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                hosts[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                    "requests": pool.num_requests,
+                    "connections": pool.num_connections,
+                }
+        requests_sent = sum(x["requests"] for x in hosts.values())
+        connections = sum(x["connections"] for x in hosts.values())
+        return {
+            "requests": requests_sent,
+            "connections": connections,
+            "reuse_rate": 1 - connections / requests_sent if requests_sent else 0,
+            "hosts": hosts,
+        }
+
+    def close(self):
+        """
+        Closes every session and the pooled connections.
+        """
+        with self.lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions = []
+        self.adapter.close()
@@ -0,0 +1,282 @@
+"""
+This file holds the output writers, which write rows of results to a file as they are finished.
+The writer is picked from the extension of the output file: CSV, Parquet and SQLite files are
+written row by row, while Excel files are kept in memory and written when the writer is closed.
+
+Author: Raine Fuerst
+"""
+
+import csv
+import os
+import sqlite3
+import pandas
+
+
+class RowWriter:
+    """
+    This class is the base of every output writer. Rows are dictionaries keyed by the column names
+    given when the writer is created, missing columns are written as empty.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+
+    def append(self, row):
+        """
+        Writes a single row.
+
+        Args:
+            row (dict): The values of the row keyed by column name
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Finishes writing and closes the output file.
+        """
+
+    @classmethod
+    def read(cls, path):
+        """
+        Reads back a file written by this writer, keeping the values as they were written.
+
+        Args:
+            path (str): The file to read
+
+        Returns:
+            Tuple(list, list): The column names and a dictionary for each row
+        """
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CsvWriter(RowWriter):
+    """
+    This class writes rows to a CSV file with a header line, flushing after every row so that the
+    file is usable while the run is still going.
+    """
+
+    def __init__(self, path, columns):
+        super().__init__(path, columns)
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, self.columns, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def append(self, row):
+        # csv writes NaN as "nan", empty cells should be empty like the other missing values
+        self.writer.writerow({
+            k: "" if isinstance(v, float) and v != v else v for k, v in row.items()
+        })
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        return (reader.fieldnames or [], rows)
+
+
+class SqliteWriter(RowWriter):
+    """
+    This class writes rows to a table of a SQLite database, which is replaced if it already exists.
+    Rows are committed in batches.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, path, columns, table="items"):
+        super().__init__(path, columns)
+        self.table = table
+        self.pending = 0
+        self.connection = sqlite3.connect(path)
+        names = ", ".join(f'"{x}"' for x in self.columns)
+        self.connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+        self.connection.execute(f'CREATE TABLE "{table}" ({names})')
+        self.insert = (
+            f'INSERT INTO "{table}" ({names}) VALUES ({", ".join("?" * len(self.columns))})'
+        )
+
+    def append(self, row):
+        values = []
+        for column in self.columns:
+            value = row.get(column)
+            # NaN is stored as a float by sqlite3, empty cells should be NULL
+            values.append(None if isinstance(value, float) and value != value else value)
+        self.connection.execute(self.insert, values)
+        self.pending += 1
+        if self.pending >= self.BATCH_SIZE:
+            self.connection.commit()
+            self.pending = 0
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    @classmethod
+    def read(cls, path, table="items"):
+        connection = sqlite3.connect(path)
+        try:
+            cursor = connection.execute(f'SELECT * FROM "{table}" ORDER BY rowid')
+            columns = [x[0] for x in cursor.description]
+            rows = [dict(zip(columns, x)) for x in cursor]
+        finally:
+            connection.close()
+        return (columns, rows)
+
+
+class ParquetWriter(RowWriter):
+    """
+    This class writes rows to a Parquet file, one row group per BATCH_SIZE rows. The column types
+    are taken from the first row group, columns that are empty in it are written as strings.
+    Requires pyarrow.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, path, columns):
+        super().__init__(path, columns)
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ImportError("Writing Parquet files requires pyarrow") from error
+        self.pyarrow = pyarrow
+        self.rows = []
+        self.schema = None
+        self.writer = None
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        """
+        Writes the buffered rows as a row group.
+        """
+        frame = pandas.DataFrame.from_records(self.rows, columns=self.columns)
+        self.rows = []
+        if self.schema is None:
+            schema = self.pyarrow.Schema.from_pandas(frame, preserve_index=False)
+            self.schema = self.pyarrow.schema([
+                x.with_type(self.pyarrow.string()) if self.pyarrow.types.is_null(x.type) else x
+                for x in schema
+            ])
+            self.writer = self.pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        table = self.pyarrow.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.rows or self.writer is None:
+            self._flush()
+        self.writer.close()
+
+    @classmethod
+    def read(cls, path):
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        table = pyarrow.parquet.read_table(path)
+        return (table.column_names, table.to_pylist())
+
+
+class ExcelWriter(RowWriter):
+    """
+    This class keeps every row in memory and writes them to an Excel file when closed, with the
+    row numbers as the first column. The rows are kept as tuples in the order of the columns, which
+    takes less memory than keeping the dicts. Closing can be retried if writing the file fails.
+    """
+
+    def __init__(self, path, columns):
+        super().__init__(path, columns)
+        self.rows = []
+
+    def append(self, row):
+        self.rows.append(tuple(row.get(x) for x in self.columns))
+
+    def close(self):
+        frame = pandas.DataFrame.from_records(self.rows, columns=self.columns)
+        frame.to_excel(self.path, sheet_name='Sheet1')
+
+    @classmethod
+    def read(cls, path):
+        # Reading as objects keeps every cell as the type it was written as
+        frame = pandas.read_excel(path, index_col=0, dtype=object)
+        rows = [
+            {k: None if isinstance(v, float) and v != v else v for k, v in row.items()}
+            for row in frame.to_dict("records")
+        ]
+        return (list(frame.columns), rows)
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+    "sqlite": SqliteWriter,
+    "xlsx": ExcelWriter,
+}
+EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+    ".db": "sqlite",
+    ".xlsx": "xlsx",
+}
+
+
+def output_format(path, file_format=None):
+    """
+    Returns the name of the format used for the given output file.
+
+    Args:
+        path (str): The output file
+        file_format (str): The format to use regardless of the extension, if any
+
+    Returns:
+        str: The name of the format, one of the keys of WRITERS
+    """
+    if file_format:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"Unknown output format for '{path}', expected one of {list(EXTENSIONS)}")
+    return EXTENSIONS[extension]
+
+
+def open_writer(path, columns, file_format=None):
+    """
+    Creates the writer for the given output file.
+
+    Args:
+        path (str): The output file
+        columns (list): The names of the columns of every row
+        file_format (str): The format to use regardless of the extension, if any
+
+    Returns:
+        RowWriter: The writer for the file
+    """
+    return WRITERS[output_format(path, file_format)](path, columns)
+
+
+def read_rows(path, file_format=None):
+    """
+    Reads back a file written by one of the writers.
+
+    Args:
+        path (str): The file to read
+        file_format (str): The format to use regardless of the extension, if any
+
+    Returns:
+        Tuple(list, list): The column names and a dictionary for each row
+    """
+    return WRITERS[output_format(path, file_format)].read(path)